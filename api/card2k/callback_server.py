@@ -0,0 +1,134 @@
+import hashlib
+import hmac
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import web
+
+from helpers.console import logger
+
+
+class CallbackServer:
+    """
+    HTTP server nhỏ chạy trong process bot để nhận callback trạng thái thẻ từ card2k
+
+    handler(payload) trả về True nếu tìm thấy thẻ tương ứng, False nếu không tìm thấy.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[dict], Awaitable[bool]],
+        partner_key: str,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        path: str = "/callback",
+        max_processed: int = 10000,
+    ):
+        self.handler = handler
+        self.partner_key = partner_key
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_processed = max_processed
+
+        # request_id đã xử lý xong (giới hạn kích thước) và đang xử lý
+        self._processed: "OrderedDict[str, None]" = OrderedDict()
+        self._in_flight: set = set()
+        self._runner: Optional[web.AppRunner] = None
+
+    def build_app(self) -> web.Application:
+        """
+        Tạo aiohttp application với route callback
+        """
+
+        app = web.Application()
+        app.router.add_route("GET", self.path, self._handle)
+        app.router.add_route("POST", self.path, self._handle)
+        return app
+
+    async def start(self) -> None:
+        """
+        Khởi động HTTP server
+        """
+
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logger.info(f"[API Card2K Callback] Đang lắng nghe callback tại {self.host}:{self.port}{self.path}")
+
+    async def stop(self) -> None:
+        """
+        Dừng HTTP server
+        """
+
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def verify_sign(self, payload: dict) -> bool:
+        """
+        Kiểm tra chữ ký callback: md5(partner_key + code + serial)
+        """
+
+        sign = payload.get("callback_sign") or payload.get("sign")
+        if not sign:
+            return False
+        expected = hashlib.md5(
+            f"{self.partner_key}{payload.get('code', '')}{payload.get('serial', '')}".encode()
+        ).hexdigest()
+        return hmac.compare_digest(str(sign).lower(), expected)
+
+    async def _read_payload(self, request: web.Request) -> dict:
+        """
+        Đọc dữ liệu callback từ query, form hoặc JSON
+        """
+
+        if request.method == "GET":
+            return dict(request.query)
+        if request.content_type == "application/json":
+            data = await request.json()
+            return data if isinstance(data, dict) else {}
+        return dict(await request.post())
+
+    def _mark_processed(self, request_id: str) -> None:
+        self._processed[request_id] = None
+        self._processed.move_to_end(request_id)
+        while len(self._processed) > self.max_processed:
+            self._processed.popitem(last=False)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        try:
+            payload = await self._read_payload(request)
+        except Exception as e:
+            logger.warning(f"[API Card2K Callback] Dữ liệu callback không hợp lệ: {e}")
+            return web.json_response({"status": "error", "message": "invalid payload"}, status=400)
+
+        request_id = str(payload.get("request_id") or "")
+        if not request_id or "status" not in payload:
+            return web.json_response({"status": "error", "message": "missing request_id or status"}, status=400)
+
+        if not self.verify_sign(payload):
+            logger.warning(f"[API Card2K Callback] Sai chữ ký callback: {request_id}")
+            return web.json_response({"status": "error", "message": "invalid sign"}, status=403)
+
+        # Bỏ qua callback lặp lại
+        if request_id in self._processed or request_id in self._in_flight:
+            return web.json_response({"status": "success", "message": "duplicate"})
+
+        self._in_flight.add(request_id)
+        try:
+            found = await self.handler(payload)
+        except Exception as e:
+            logger.error(f"[API Card2K Callback] Lỗi khi xử lý callback {request_id}: {e}")
+            return web.json_response({"status": "error", "message": "internal error"}, status=500)
+        finally:
+            self._in_flight.discard(request_id)
+
+        if not found:
+            return web.json_response({"status": "error", "message": "request_id not found"}, status=404)
+
+        # Chỉ đánh dấu đã xử lý khi thẻ đã có kết quả cuối cùng
+        if str(payload.get("status")) != "99":
+            self._mark_processed(request_id)
+        return web.json_response({"status": "success"})
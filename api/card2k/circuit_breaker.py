@@ -0,0 +1,161 @@
+import itertools
+import time
+from collections import deque
+from typing import Dict, Optional
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Token của request gửi khi mạch đóng (không phải request thăm dò)
+NORMAL_REQUEST = 0
+
+
+class CircuitOpenError(Exception):
+    """
+    Nhà cung cấp đang tạm ngắt (bảo trì hoặc lỗi liên tục), request không được gửi đi
+    """
+
+
+class CircuitBreaker:
+    """
+    Ngắt mạch cho nhà cung cấp card2k
+
+    - closed: gửi request bình thường, ghi nhận kết quả trong cửa sổ window request gần nhất
+    - open: chặn mọi request trong open_duration giây (maintenance_duration nếu do bảo trì)
+    - half_open: hết thời gian chặn, cho đúng một request thăm dò; thành công thì đóng lại, lỗi thì mở tiếp
+
+    allow_request trả về token của request, kết quả được ghi nhận kèm token đó. Khi mạch không đóng,
+    chỉ kết quả của request thăm dò mới đổi trạng thái; kết quả đến muộn của các request gửi trước
+    khi mạch mở bị bỏ qua.
+
+    Mạch mở khi nhà cung cấp báo bảo trì, khi có consecutive_failures lỗi liên tiếp,
+    hoặc khi tỷ lệ lỗi trong cửa sổ đạt failure_rate (tối thiểu min_calls request).
+    """
+
+    def __init__(
+        self,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        consecutive_failures: int = 5,
+        open_duration: float = 60,
+        maintenance_duration: float = 300,
+    ):
+        self.failure_rate = float(failure_rate)
+        self.min_calls = max(1, int(min_calls))
+        self.consecutive_failures = max(1, int(consecutive_failures))
+        self.open_duration = float(open_duration)
+        self.maintenance_duration = float(maintenance_duration)
+
+        self.state = STATE_CLOSED
+        self.reason: Optional[str] = None
+        self._outcomes = deque(maxlen=max(1, int(window)))
+        self._failure_streak = 0
+        self._open_until = 0.0
+        self._probe_token: Optional[int] = None
+        self._tokens = itertools.count(NORMAL_REQUEST + 1)
+        self.opened = 0
+
+    @property
+    def is_closed(self) -> bool:
+        return self.state == STATE_CLOSED
+
+    @property
+    def retry_in(self) -> float:
+        """
+        Số giây còn lại đến khi được gửi request thăm dò
+        """
+
+        if self.state == STATE_CLOSED:
+            return 0.0
+        return max(0.0, self._open_until - time.monotonic())
+
+    def probe_due(self) -> bool:
+        """
+        Mạch đang mở nhưng đã hết thời gian chặn và chưa có request thăm dò nào
+        """
+
+        return self.state != STATE_CLOSED and self._probe_token is None and time.monotonic() >= self._open_until
+
+    def allow_request(self) -> Optional[int]:
+        """
+        Kiểm tra request có được gửi không (request đầu tiên sau thời gian chặn là request thăm dò)
+
+        Trả về token để ghi nhận kết quả (NORMAL_REQUEST khi mạch đóng), None nếu request bị chặn
+        """
+
+        if self.state == STATE_CLOSED:
+            return NORMAL_REQUEST
+        if not self.probe_due():
+            return None
+        self.state = STATE_HALF_OPEN
+        self._probe_token = next(self._tokens)
+        return self._probe_token
+
+    def _is_probe(self, token: int) -> bool:
+        return token != NORMAL_REQUEST and token == self._probe_token
+
+    def record_success(self, token: int = NORMAL_REQUEST) -> None:
+        if self.state != STATE_CLOSED:
+            if self._is_probe(token):
+                self._close()
+            return
+        self._failure_streak = 0
+        self._outcomes.append(False)
+
+    def record_failure(self, reason: str = "error", token: int = NORMAL_REQUEST) -> None:
+        if self.state != STATE_CLOSED:
+            if self._is_probe(token):
+                self._open(reason, self.open_duration)
+            return
+
+        self._failure_streak += 1
+        self._outcomes.append(True)
+        failures = sum(self._outcomes)
+        if self._failure_streak >= self.consecutive_failures or (
+            len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate
+        ):
+            self._open(reason, self.open_duration)
+
+    def record_maintenance(self, token: int = NORMAL_REQUEST) -> None:
+        """
+        Nhà cung cấp báo bảo trì: mở mạch ngay
+        """
+
+        if self.state != STATE_CLOSED and not self._is_probe(token):
+            return
+        self._open("maintenance", self.maintenance_duration)
+
+    def release_probe(self, token: int) -> None:
+        """
+        Request thăm dò bị hủy trước khi có kết quả, cho phép thăm dò lại
+        """
+
+        if self._is_probe(token):
+            self._probe_token = None
+
+    def _open(self, reason: str, duration: float) -> None:
+        if self.state == STATE_CLOSED:
+            self.opened += 1
+        self.state = STATE_OPEN
+        self.reason = reason
+        self._open_until = time.monotonic() + duration
+        self._probe_token = None
+
+    def _close(self) -> None:
+        self.state = STATE_CLOSED
+        self.reason = None
+        self._outcomes.clear()
+        self._failure_streak = 0
+        self._probe_token = None
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "reason": self.reason,
+            "retry_in": self.retry_in,
+            "failures": sum(self._outcomes),
+            "calls": len(self._outcomes),
+            "opened": self.opened,
+        }
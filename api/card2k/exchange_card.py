@@ -1,35 +1,230 @@
-import requests
+import asyncio
 import hashlib
+import time
+from typing import Optional
 
+import aiohttp
+
+from api.card2k.circuit_breaker import CircuitBreaker, CircuitOpenError
+from api.card2k.rate_limiter import PRIORITY_BACKGROUND, PRIORITY_CHECK, PRIORITY_SUBMIT, RateLimiter, parse_retry_after
 from helpers.console import logger
+from helpers.metrics import provider_request_seconds
 from utils.env import get_partner_id, get_partner_key
 from utils.config import get_config_value
 
 
+# Độ ưu tiên của từng lệnh khi xếp hàng chờ rate limiter
+COMMAND_PRIORITIES = {
+    "charging": PRIORITY_SUBMIT,
+    "check": PRIORITY_CHECK,
+    "getfee": PRIORITY_BACKGROUND,
+    "check_api": PRIORITY_BACKGROUND,
+}
+
+
 class ExchangeCard:
     def __init__(self):
         self.partner_id = get_partner_id()
         self.partner_key = get_partner_key()
         self.provider = get_config_value("provider", "https://card2k.com")
 
-    def get_fee_exchange_card(self) -> dict:
+        # Cấu hình connection pool và timeout cho HTTP client
+        http_config = get_config_value("http_client", {}) or {}
+        self.pool_size = int(http_config.get("pool_size", 20))
+        self.pool_size_per_host = int(http_config.get("pool_size_per_host", 10))
+        self.keepalive_timeout = float(http_config.get("keepalive_timeout", 30))
+        self.default_timeout = float(http_config.get("timeout", 10))
+        self.timeouts = dict(http_config.get("timeouts", {}) or {})
+
+        # Giới hạn tốc độ gửi request đến nhà cung cấp
+        rate_limit_config = http_config.get("rate_limit", {}) or {}
+        self.rate_limiter = RateLimiter(
+            rate=float(rate_limit_config.get("rate", 10)),
+            burst=rate_limit_config.get("burst"),
+        )
+        self.retry_on_429 = max(0, int(rate_limit_config.get("retry_on_429", 1)))
+        self.max_retry_after = float(rate_limit_config.get("max_retry_after", 60))
+
+        # Ngắt mạch khi nhà cung cấp bảo trì hoặc lỗi liên tục
+        breaker_config = http_config.get("circuit_breaker", {}) or {}
+        self.circuit_breaker = CircuitBreaker(
+            failure_rate=float(breaker_config.get("failure_rate", 0.5)),
+            window=int(breaker_config.get("window", 20)),
+            min_calls=int(breaker_config.get("min_calls", 10)),
+            consecutive_failures=int(breaker_config.get("consecutive_failures", 5)),
+            open_duration=float(breaker_config.get("open_duration", 60)),
+            maintenance_duration=float(breaker_config.get("maintenance_duration", 300)),
+        )
+
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Lấy session dùng chung (tạo mới nếu chưa có hoặc đã đóng)
+        """
+
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.default_timeout),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """
+        Đóng session và giải phóng connection pool
+        """
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _get_timeout(self, command: str, timeout: Optional[float] = None) -> aiohttp.ClientTimeout:
+        """
+        Lấy timeout cho từng lệnh (ưu tiên tham số truyền vào, sau đó đến cấu hình)
+        """
+
+        if timeout is None:
+            timeout = self.timeouts.get(command, self.default_timeout)
+        return aiohttp.ClientTimeout(total=float(timeout))
+
+    async def _request(self, method: str, url: str, command: str, timeout: Optional[float] = None, **kwargs) -> dict:
+        """
+        Gửi request đến nhà cung cấp và trả về JSON
+
+        Ngoại lệ:
+            CircuitOpenError: Nhà cung cấp đang tạm ngắt, request không được gửi
+        """
+
+        token = self.circuit_breaker.allow_request()
+        if token is None:
+            raise CircuitOpenError(f"Nhà cung cấp tạm ngắt ({self.circuit_breaker.reason}), thử lại sau {self.circuit_breaker.retry_in:.0f}s")
+
+        recorded = False
+        outcome = "error"
+        started_at = time.perf_counter()
+        try:
+            data = await self._send(method, url, command, timeout, **kwargs)
+        except aiohttp.ClientResponseError as e:
+            # Lỗi phía nhà cung cấp (5xx) mới tính là lỗi, 4xx/429 vẫn cho thấy nhà cung cấp hoạt động
+            if e.status >= 500:
+                self.circuit_breaker.record_failure(f"http {e.status}", token)
+            else:
+                self.circuit_breaker.record_success(token)
+            outcome = f"http_{e.status}"
+            recorded = True
+            raise
+        except asyncio.TimeoutError:
+            self.circuit_breaker.record_failure("timeout", token)
+            outcome = "timeout"
+            recorded = True
+            raise
+        except aiohttp.ClientError:
+            self.circuit_breaker.record_failure("connection", token)
+            outcome = "connection"
+            recorded = True
+            raise
+        finally:
+            if not recorded and not self.circuit_breaker.is_closed:
+                # Request thăm dò bị hủy hoặc lỗi không xác định, cho phép thăm dò lại
+                self.circuit_breaker.release_probe(token)
+            if recorded:
+                provider_request_seconds.observe(time.perf_counter() - started_at, command=command, outcome=outcome)
+
+        if self._is_maintenance(command, data):
+            self.circuit_breaker.record_maintenance(token)
+            outcome = "maintenance"
+        else:
+            self.circuit_breaker.record_success(token)
+            outcome = "ok"
+        provider_request_seconds.observe(time.perf_counter() - started_at, command=command, outcome=outcome)
+        return data
+
+    async def _send(self, method: str, url: str, command: str, timeout: Optional[float] = None, **kwargs) -> dict:
+        """
+        Gửi request qua rate limiter, gửi lại sau thời gian Retry-After khi nhận 429
+        """
+
+        session = await self._get_session()
+        priority = COMMAND_PRIORITIES.get(command, PRIORITY_BACKGROUND)
+        for attempt in range(self.retry_on_429 + 1):
+            await self.rate_limiter.acquire(priority)
+            async with session.request(method, url, timeout=self._get_timeout(command, timeout), **kwargs) as response:
+                if response.status == 429:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if retry_after is None:
+                        retry_after = 1.0
+                    self.rate_limiter.pause(min(retry_after, self.max_retry_after))
+                    logger.warning(f"[API Card2K Exchange-Card] {command} bị giới hạn (429), chờ {retry_after:.1f}s")
+                    if attempt < self.retry_on_429 and retry_after <= self.max_retry_after:
+                        continue
+                response.raise_for_status()
+                return await response.json(content_type=None)
+
+    @staticmethod
+    def _is_maintenance(command: str, data: dict) -> bool:
+        """
+        Kiểm tra phản hồi báo nhà cung cấp đang bảo trì
+        """
+
+        if not isinstance(data, dict):
+            return False
+        if command == "check_api":
+            return data.get("status") == "success" and (data.get("data") or {}).get("status") not in (None, "active")
+        return str(data.get("status")) == "4"
+
+    async def ensure_available(self) -> bool:
+        """
+        Kiểm tra nhà cung cấp có nhận request không
+
+        Khi mạch đang mở và đã hết thời gian chặn, gửi một request kiểm tra API để thăm dò
+        """
+
+        if self.circuit_breaker.is_closed:
+            return True
+        if self.circuit_breaker.probe_due():
+            await self.check_status_api()
+        return self.circuit_breaker.is_closed
+
+    def get_circuit_breaker_stats(self) -> dict:
+        """
+        Trạng thái ngắt mạch: state, reason, retry_in, failures/calls trong cửa sổ, số lần mở
+        """
+
+        return self.circuit_breaker.get_stats()
+
+    def get_rate_limit_stats(self) -> dict:
+        """
+        Thống kê rate limiter: số request đang chờ và thời gian chờ theo độ ưu tiên
+        """
+
+        return self.rate_limiter.get_stats()
+
+    async def get_fee_exchange_card(self, timeout: Optional[float] = None) -> dict:
         """
         API: Lấy phí đổi thẻ cào
         """
 
-        url = f"{self.provider}/chargingws/v2/getfee?partner_id={self.partner_id}"
+        url = f"{self.provider}/chargingws/v2/getfee"
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            logger.error(f"[API Card2K Exchange-Card] Lỗi hàm get_fee: {e}")
+            return await self._request("GET", url, "getfee", timeout, params={"partner_id": self.partner_id})
+        except CircuitOpenError as e:
+            logger.warning(f"[API Card2K Exchange-Card] Bỏ qua get_fee: {e}")
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"[API Card2K Exchange-Card] Lỗi hàm get_fee: {e!r}")
             return None
         except Exception as e:
             logger.error(f"[API Card2K Exchange-Card] Lỗi hàm get_fee: {e}")
             return None
 
-    def exchange_card(self, data: dict) -> dict:
+    async def exchange_card(self, data: dict, timeout: Optional[float] = None) -> dict:
         """
         API: Gửi thẻ cào đến nhà cung cấp
 
@@ -56,17 +251,18 @@ class ExchangeCard:
             "command": "charging",
         }
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            logger.error(f"[API Card2K Exchange-Card] Lỗi hàm exchange_card: {e}")
+            return await self._request("POST", url, "charging", timeout, json=payload)
+        except CircuitOpenError as e:
+            logger.warning(f"[API Card2K Exchange-Card] Bỏ qua exchange_card: {e}")
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"[API Card2K Exchange-Card] Lỗi hàm exchange_card: {e!r}")
             return None
         except Exception as e:
             logger.error(f"[API Card2K Exchange-Card] Lỗi hàm exchange_card: {e}")
             return None
 
-    def check_exchange_card(self, data: dict) -> dict:
+    async def check_exchange_card(self, data: dict, timeout: Optional[float] = None) -> dict:
         """
         API: Kiểm tra thẻ đã gửi
 
@@ -86,24 +282,25 @@ class ExchangeCard:
             "telco": data["telco"],
             "code": data["code"],
             "serial": data["serial"],
-            "amount": data["amount"],
+            "amount": str(data["amount"]),
             "request_id": data["request_id"],
             "partner_id": self.partner_id,
             "sign": sign,
             "command": "check",
         }
         try:
-            response = requests.get(url, params=payload)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            logger.error(f"[API Card2K Exchange-Card] Lỗi hàm check_exchange_card: {e}")
+            return await self._request("GET", url, "check", timeout, params=payload)
+        except CircuitOpenError as e:
+            logger.warning(f"[API Card2K Exchange-Card] Bỏ qua check_exchange_card: {e}")
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"[API Card2K Exchange-Card] Lỗi hàm check_exchange_card: {e!r}")
             return None
         except Exception as e:
             logger.error(f"[API Card2K Exchange-Card] Lỗi hàm check_exchange_card: {e}")
             return None
 
-    def check_status_api(self) -> bool:
+    async def check_status_api(self, timeout: Optional[float] = None) -> bool:
         """
         API: Kiểm tra trạng thái API
         """
@@ -114,15 +311,16 @@ class ExchangeCard:
         }
         url = f"{self.provider}/chargingws/v2/check-api"
         try:
-            response = requests.get(url, params=payload)
-            response.raise_for_status()
-            data = response.json()
+            data = await self._request("GET", url, "check_api", timeout, params=payload)
             if data.get('status') == 'success' and "data" in data and data["data"].get("status") == "active":
                 return True
             logger.error(f"[API Card2K Exchange-Card] Lỗi hàm check_status_api: {data.get('message')}")
             return False
-        except requests.RequestException as e:
-            logger.error(f"[API Card2K Exchange-Card] Lỗi hàm check_status_api: {e}")
+        except CircuitOpenError as e:
+            logger.warning(f"[API Card2K Exchange-Card] Bỏ qua check_status_api: {e}")
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"[API Card2K Exchange-Card] Lỗi hàm check_status_api: {e!r}")
             return None
         except Exception as e:
             logger.error(f"[API Card2K Exchange-Card] Lỗi hàm check_status_api: {e}")
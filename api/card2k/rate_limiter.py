@@ -0,0 +1,173 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+# Thứ tự ưu tiên: số nhỏ hơn được cấp lượt trước
+PRIORITY_SUBMIT = 0
+PRIORITY_CHECK = 1
+PRIORITY_BACKGROUND = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_SUBMIT: "submit",
+    PRIORITY_CHECK: "check",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Đọc header Retry-After (số giây hoặc HTTP-date), trả về số giây cần chờ
+    """
+
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """
+    Token bucket giới hạn số request gửi đến nhà cung cấp, cấp lượt theo độ ưu tiên
+
+    - rate: số request mỗi giây (<= 0 là không giới hạn)
+    - burst: số request tối đa được gửi dồn cùng lúc
+    Khi nhà cung cấp trả 429, pause() chặn mọi lượt đến hết thời gian Retry-After (kể cả khi rate <= 0).
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, window: int = 1000):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst if burst is not None else rate))
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+
+        self._waiters: list = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        # Thống kê theo độ ưu tiên
+        self._queued = {priority: 0 for priority in PRIORITY_NAMES}
+        self._granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self._wait_total = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._wait_max = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._recent_waits = {priority: deque(maxlen=window) for priority in PRIORITY_NAMES}
+        self.throttled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, priority: int = PRIORITY_BACKGROUND) -> float:
+        """
+        Chờ đến lượt gửi request, trả về số giây đã chờ
+        """
+
+        if not self.enabled:
+            # Không giới hạn tốc độ nhưng vẫn phải chờ hết Retry-After của lần 429 gần nhất
+            waited = max(0.0, self._paused_until - time.monotonic())
+            if waited > 0:
+                await asyncio.sleep(waited)
+            return waited
+
+        started_at = time.monotonic()
+        self._refill(started_at)
+        if not self._waiters and started_at >= self._paused_until and self._tokens >= 1:
+            self._tokens -= 1
+            self._record(priority, 0.0)
+            return 0.0
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._queued[priority] += 1
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            await future
+        finally:
+            self._queued[priority] -= 1
+
+        waited = time.monotonic() - started_at
+        self._record(priority, waited)
+        return waited
+
+    async def _dispatch(self) -> None:
+        """
+        Cấp lượt cho các request đang chờ theo độ ưu tiên khi có token
+        """
+
+        while self._waiters:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            self._refill(now)
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Request đã bị hủy trong lúc chờ
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Tạm dừng gửi request trong seconds giây (khi nhận 429)
+        """
+
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + max(0.0, seconds))
+        self._tokens = 0.0
+
+    def _record(self, priority: int, waited: float) -> None:
+        self._granted[priority] += 1
+        self._wait_total[priority] += waited
+        self._wait_max[priority] = max(self._wait_max[priority], waited)
+        self._recent_waits[priority].append(waited)
+
+    def get_stats(self) -> Dict[str, object]:
+        """
+        Thống kê hàng đợi và thời gian chờ theo độ ưu tiên (thời gian tính bằng giây)
+        """
+
+        priorities = {}
+        for priority, name in PRIORITY_NAMES.items():
+            recent = sorted(self._recent_waits[priority])
+            granted = self._granted[priority]
+            priorities[name] = {
+                "queued": self._queued[priority],
+                "granted": granted,
+                "wait_avg": self._wait_total[priority] / granted if granted else 0.0,
+                "wait_p99": recent[min(len(recent) - 1, int(len(recent) * 0.99))] if recent else 0.0,
+                "wait_max": self._wait_max[priority],
+            }
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "queued": sum(self._queued.values()),
+            "throttled": self.throttled,
+            "paused_for": max(0.0, self._paused_until - time.monotonic()),
+            "priorities": priorities,
+        }
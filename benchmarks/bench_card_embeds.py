@@ -0,0 +1,110 @@
+"""
+Benchmark: dựng embed kết quả thẻ theo cách cũ (từng field + footer mỗi lần) so với EmbedTemplate
+
+Mô phỏng một chu kỳ kiểm tra có nhiều thẻ đổi trạng thái cùng lúc.
+
+Chạy: python -m benchmarks.bench_card_embeds [số thẻ]
+"""
+
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import discord
+
+from services.discord.card_embeds import result_embed
+from utils.embed import _add_footer
+
+
+# Cách cũ: dựng lại toàn bộ embed và footer cho từng thẻ
+def legacy_result_embed(card, status: str, error_message: str = None) -> discord.Embed:
+    if status == "success":
+        embed = discord.Embed(
+            title="✅ Thẻ cào đã được xử lý thành công",
+            description="Thẻ cào của bạn đã được xử lý thành công với đúng mệnh giá!",
+            color=discord.Color.green(),
+        )
+        embed.add_field(name="Nhà mạng", value=card.telco, inline=True)
+        embed.add_field(name="Mệnh giá", value=f"{card.value:,} VND", inline=True)
+        embed.add_field(name="Mã giao dịch", value=f"`{card.transaction_id}`", inline=True)
+        embed.add_field(name="Mã thẻ", value=f"||{card.code}||", inline=True)
+        embed.add_field(name="Serial", value=f"||{card.serial}||", inline=True)
+        embed.add_field(name="Mệnh giá thực tế", value=f"**{card.card_value:,} VND**", inline=True)
+        embed.add_field(name="🎉 Chúc mừng", value="Thẻ cào đã được xử lý thành công với đúng mệnh giá!", inline=False)
+    elif status == "wrong_amount":
+        embed = discord.Embed(
+            title="⚠️ Thẻ cào sai mệnh giá",
+            description="Thẻ cào đã được xử lý nhưng sai mệnh giá, giá trị sẽ bị trừ 50%.",
+            color=discord.Color.orange(),
+        )
+        embed.add_field(name="Nhà mạng", value=card.telco, inline=True)
+        embed.add_field(name="Mệnh giá khai báo", value=f"{card.value:,} VND", inline=True)
+        embed.add_field(name="Mã giao dịch", value=f"`{card.transaction_id}`", inline=True)
+        embed.add_field(name="Mã thẻ", value=f"||{card.code}||", inline=True)
+        embed.add_field(name="Serial", value=f"||{card.serial}||", inline=True)
+        embed.add_field(name="Mệnh giá thực tế", value=f"{card.card_value:,} VND", inline=True)
+        embed.add_field(name="⚠️ Lưu ý", value="Do thẻ sai mệnh giá, giá trị đã bị trừ 50% theo quy định.", inline=False)
+    else:
+        embed = discord.Embed(
+            title="❌ Thẻ cào xử lý thất bại",
+            description="Rất tiếc, thẻ cào của bạn không thể được xử lý.",
+            color=discord.Color.red(),
+        )
+        embed.add_field(name="Nhà mạng", value=card.telco, inline=True)
+        embed.add_field(name="Mệnh giá", value=f"{card.value:,} VND", inline=True)
+        embed.add_field(name="Mã giao dịch", value=f"`{card.transaction_id}`", inline=True)
+        embed.add_field(name="Mã thẻ", value=f"||{card.code}||", inline=True)
+        embed.add_field(name="Serial", value=f"||{card.serial}||", inline=True)
+        embed.add_field(name="⠀", value="⠀", inline=True)
+        embed.add_field(name="❌ Lý do", value=error_message or "Thẻ cào không hợp lệ hoặc đã được sử dụng.", inline=False)
+    return _add_footer(embed)
+
+
+def build_flips(count: int) -> list:
+    """
+    Tạo danh sách thẻ giả lập kèm trạng thái mới
+    """
+
+    rng = random.Random(42)
+    statuses = ["success", "wrong_amount", "failed"]
+    flips = []
+    for i in range(count):
+        value = rng.choice([10_000, 20_000, 50_000, 100_000, 500_000])
+        card = SimpleNamespace(
+            telco=rng.choice(["VIETTEL", "VINAPHONE", "ZING"]),
+            value=value,
+            code=f"{i:015d}",
+            serial=f"{i:014d}",
+            transaction_id=f"T{i}",
+            card_value=value // 2,
+        )
+        status = rng.choice(statuses)
+        flips.append((card, status, "Thẻ đã được sử dụng" if status == "failed" and i % 2 else None))
+    return flips
+
+
+def measure(name: str, render, flips: list) -> float:
+    started_at = time.perf_counter()
+    for card, status, error_message in flips:
+        render(card, status, error_message)
+    seconds = time.perf_counter() - started_at
+    print(f"{name:<16} {len(flips) / seconds:>10,.0f} embed/s ({seconds * 1e6 / len(flips):.2f} µs/embed)")
+    return seconds
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    flips = build_flips(count)
+
+    # Kết quả phải giống hệt cách cũ
+    for card, status, error_message in flips[:1000]:
+        assert legacy_result_embed(card, status, error_message).to_dict() == result_embed(card, status, error_message).to_dict()
+
+    legacy_seconds = measure("legacy", legacy_result_embed, flips)
+    template_seconds = measure("EmbedTemplate", result_embed, flips)
+    print(f"EmbedTemplate so với cách cũ: {legacy_seconds / template_seconds:.2f}x (>1: nhanh hơn)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark: kiểm tra thẻ bằng cách cũ (tra cấu hình và dựng bảng định dạng mỗi lần) so với CardValidator
+
+Chạy: python -m benchmarks.bench_card_validator [số thẻ]
+"""
+
+import random
+import string
+import sys
+import time
+
+from services.card2k.card_validator import get_card_validator
+from utils.config import get_config_value
+
+_LEGACY_FORMAT_DICT = {
+    "VIETTEL": {"seri": [11, 14], "pin": [13, 15]},
+    "MOBIFONE": {"seri": [15], "pin": [12]},
+    "VINAPHONE": {"seri": [14], "pin": [14]},
+    "VNMOBI": {"seri": [16], "pin": [12]},
+    "VNMB": {"seri": [16], "pin": [12]},
+    "VIETNAMOBILE": {"seri": [16], "pin": [12]},
+    "GARENA": {"seri": [9], "pin": [16]},
+    "GARENA2": {"seri": [9], "pin": [16]},
+    "ZING": {"seri": [12], "pin": [9]},
+    "VCOIN": {"seri": [12], "pin": [12]},
+    "GATE": {"seri": [10], "pin": [10]},
+    "APPOTA": {"seri": [12], "pin": [12]},
+}
+
+
+# Cách cũ: tra cấu hình và dựng lại bảng định dạng ở mỗi lần gọi
+def legacy_validate(telco: str, amount: int, code: str, serial: str) -> bool:
+    if not get_config_value("card_types", {}).get(telco, False):
+        return False
+    telco_amounts = get_config_value("card_amounts", {}).get(telco, {})
+    if amount not in telco_amounts or not telco_amounts[amount]:
+        return False
+    format_dict = dict(_LEGACY_FORMAT_DICT)
+    telco_upper = telco.upper()
+    if telco_upper not in format_dict:
+        return False
+    if not (serial.isalnum() and code.isalnum()):
+        return False
+    return len(serial) in format_dict[telco_upper]["seri"] and len(code) in format_dict[telco_upper]["pin"]
+
+
+def build_cards(count: int) -> list:
+    """
+    Tạo danh sách thẻ giả lập (hợp lệ và không hợp lệ lẫn lộn)
+    """
+
+    rng = random.Random(42)
+    telcos = list(get_config_value("card_types", {}))
+    amounts = [5_000, 10_000, 20_000, 50_000, 100_000, 500_000, 1_000_000]
+    alphabet = string.digits + string.ascii_uppercase
+    return [
+        (
+            rng.choice(telcos),
+            rng.choice(amounts),
+            "".join(rng.choices(alphabet, k=rng.randint(9, 16))),
+            "".join(rng.choices(alphabet, k=rng.randint(9, 16))),
+        )
+        for _ in range(count)
+    ]
+
+
+def measure(name: str, validate, cards: list) -> float:
+    started_at = time.perf_counter()
+    valid = sum(1 for card in cards if validate(*card))
+    seconds = time.perf_counter() - started_at
+    print(f"{name:<16} {len(cards) / seconds:>12,.0f} thẻ/s ({valid} hợp lệ)")
+    return seconds
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    cards = build_cards(count)
+    validator = get_card_validator()
+
+    legacy_seconds = measure("legacy", legacy_validate, cards)
+    compiled_seconds = measure("validate", lambda *card: validator.validate(*card) is None, cards)
+
+    started_at = time.perf_counter()
+    valid = validator.validate_many(cards).count(None)
+    batch_seconds = time.perf_counter() - started_at
+    print(f"{'validate_many':<16} {len(cards) / batch_seconds:>12,.0f} thẻ/s ({valid} hợp lệ)")
+
+    print(f"Nhanh hơn {legacy_seconds / compiled_seconds:.1f} lần (từng thẻ), {legacy_seconds / batch_seconds:.1f} lần (theo lô)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Benchmark end-to-end: gửi thẻ và chu kỳ kiểm tra trạng thái trên server card2k giả lập
+
+Với mỗi kích thước N (số thẻ đang chờ):
+    - Tạo N thẻ pending đã đến hạn kiểm tra trong database tạm
+    - Chạy đồng thời một chu kỳ NapTheCaoTask (kiểm tra toàn bộ N thẻ) và các lượt gửi thẻ mới qua SubmissionOutbox
+    - Báo cáo thông lượng, p50 và p99 của từng lần kiểm tra, từng lần gửi thẻ và số commit database
+      (poller commit theo từng lô claim_batch_size thẻ: nhận lease + lưu kết quả, cộng một lần đọc next_due)
+
+Chạy: python -m benchmarks.bench_e2e [--sizes 1000,10000,100000] [--submissions 500] [--submitters 8]
+      [--concurrency 50] [--latency 0.005] [--jitter 0.002] [--error-rate 0] [--statuses 99:0.5,1:0.4,2:0.05,3:0.05]
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+FAKE_PORT = 18765
+
+
+def _percentile(values: list, percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def _summary(values: list) -> str:
+    return f"p50 {_percentile(values, 50) * 1e3:>7.2f} ms, p99 {_percentile(values, 99) * 1e3:>7.2f} ms"
+
+
+class _Message:
+    def __init__(self, message_id: int):
+        self.id = message_id
+
+    async def edit(self, **kwargs) -> None:
+        return None
+
+
+class _Channel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+
+    def get_partial_message(self, message_id: int) -> _Message:
+        return _Message(message_id)
+
+
+class _Dispatcher:
+    async def notify(self, channel_id: int, embed, user_discord_id=None, role_id=None) -> None:
+        return None
+
+
+class _BenchBot:
+    """
+    Bot tối giản cho NapTheCaoTask: sửa message và gửi thông báo không gọi Discord
+    """
+
+    def __init__(self, api):
+        self.card2k_api = api
+        self.notification_dispatcher = _Dispatcher()
+
+    def get_partial_messageable(self, channel_id: int) -> _Channel:
+        return _Channel(channel_id)
+
+    def get_cog(self, name: str):
+        return None
+
+    async def wait_until_ready(self) -> None:
+        await asyncio.Event().wait()
+
+
+async def _wait_for_server(url: str, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                    return
+            except aiohttp.ClientError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Server giả lập không phản hồi: {url}")
+                await asyncio.sleep(0.1)
+
+
+def _seed_pending_cards(engine, count: int) -> None:
+    """
+    Tạo count thẻ pending đã đến hạn kiểm tra
+    """
+
+    from sqlalchemy import delete, insert
+
+    from database.models import CardSubmission, HistoryExchangeCard
+
+    now = datetime.datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(delete(HistoryExchangeCard))
+        connection.execute(delete(CardSubmission))
+        for start in range(0, count, 5000):
+            connection.execute(insert(HistoryExchangeCard), [
+                {
+                    "telco": "VIETTEL", "value": 10_000, "code": f"{i:013d}", "serial": f"{i:011d}",
+                    "user_discord_id": "1", "message_discord_id": str(i + 1), "channel_discord_id": "1",
+                    "request_id": f"seed-{i}", "transaction_id": f"seed-{i}", "status": "pending",
+                    "next_check_at": now, "check_attempts": 0, "created_at": now, "updated_at": now,
+                }
+                for i in range(start, min(start + 5000, count))
+            ])
+
+
+async def _submitter(outbox, count: int, latencies: list, errors: list) -> None:
+    """
+    Gửi thẻ tuần tự như lệnh /nap_the_cao: ghi outbox, gửi card2k, lưu lịch sử
+    """
+
+    from services.card2k.submission_outbox import ACCEPTED
+
+    for i in range(count):
+        started_at = time.perf_counter()
+        try:
+            submission = await outbox.enqueue("viettel", 10_000, f"{i:013d}", f"{i:011d}", "1", "1")
+            result = await outbox.deliver(submission)
+            if result.outcome == ACCEPTED:
+                await outbox.mark_accepted(submission, result.response, message_discord_id="1", server="bench")
+            else:
+                errors.append(result.message)
+        except Exception as e:
+            # Ví dụ: sqlite bị khóa quá lâu khi chu kỳ kiểm tra đang commit
+            errors.append(repr(e))
+        latencies.append(time.perf_counter() - started_at)
+
+
+async def run_size(args, size: int, engine) -> None:
+    from api.card2k.exchange_card import ExchangeCard
+    from api.card2k.rate_limiter import RateLimiter
+    from helpers.metrics import db_commit_seconds
+    from services.card2k.card_poller import CardPoller
+    from services.card2k.submission_outbox import SubmissionOutbox
+    from tasks.nap_the_cao_task import NapTheCaoTask
+
+    seed_started_at = time.perf_counter()
+    _seed_pending_cards(engine, size)
+    seed_seconds = time.perf_counter() - seed_started_at
+
+    api = ExchangeCard()
+    api.provider = f"http://127.0.0.1:{FAKE_PORT}"
+    api.rate_limiter = RateLimiter(rate=args.rate, burst=args.rate)
+    api.pool_size = api.pool_size_per_host = max(args.concurrency, args.submitters) + 10
+
+    # Ghi lại thời gian từng lần kiểm tra thẻ
+    check_latencies = []
+    check_errors = []
+    check_exchange_card = api.check_exchange_card
+
+    async def timed_check(data, timeout=None):
+        started_at = time.perf_counter()
+        response = await check_exchange_card(data, timeout)
+        check_latencies.append(time.perf_counter() - started_at)
+        if response is None:
+            check_errors.append(data["request_id"])
+        return response
+
+    api.check_exchange_card = timed_check
+
+    poller = NapTheCaoTask(_BenchBot(api))
+    poller.poller = CardPoller(api, concurrency=args.concurrency)
+    outbox = SubmissionOutbox(api)
+
+    # Đếm số transaction của poller (mỗi lời gọi là một session_scope, một commit)
+    poll_commits = {"claim_due": 0, "commit_cards": 0, "next_due": 0}
+    for name in poll_commits:
+        def counted(*a, _method=getattr(poller.poller, name), _name=name, **kw):
+            poll_commits[_name] += 1
+            return _method(*a, **kw)
+        setattr(poller.poller, name, counted)
+
+    commits_before = sum(state[-1] for state in db_commit_seconds._values.values())
+    submit_latencies = []
+    submit_errors = []
+    per_submitter = max(1, args.submissions // args.submitters)
+
+    async def poll_cycle() -> float:
+        started_at = time.perf_counter()
+        await poller.check_history_exchange_card()
+        return time.perf_counter() - started_at
+
+    async def submit_all() -> float:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(_submitter(outbox, per_submitter, submit_latencies, submit_errors) for _ in range(args.submitters)))
+        return time.perf_counter() - started_at
+
+    cycle_seconds, submit_seconds = await asyncio.gather(poll_cycle(), submit_all())
+    commits = sum(state[-1] for state in db_commit_seconds._values.values()) - commits_before
+
+    await poller.cog_unload()
+    await api.close()
+
+    args.report(
+        f"[{size:>7,} thẻ chờ] seed {seed_seconds:6.2f}s | "
+        f"poll {len(check_latencies) / cycle_seconds:>8,.0f} thẻ/s trong {cycle_seconds:6.2f}s ({_summary(check_latencies)}, {len(check_errors)} lỗi) | "
+        f"submit {len(submit_latencies) / submit_seconds:>6,.0f} thẻ/s ({_summary(submit_latencies)}, {len(submit_errors)} lỗi) | "
+        f"{commits} commit (poller: {poll_commits['commit_cards']} lô, {sum(poll_commits.values())} commit)"
+    )
+
+
+async def main_async(args) -> None:
+    import database.models  # noqa: F401 (đăng ký các bảng vào Base.metadata)
+    from database.base import Base
+    from database.migrations import run_migrations
+    from database.session import async_engine, engine
+    from helpers.console import logger
+
+    # Không ghi log benchmark vào file log của bot
+    logger.enable_file_logging = False
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    server = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_card2k",
+        "--port", str(FAKE_PORT),
+        "--latency", str(args.latency),
+        "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate),
+        "--statuses", args.statuses,
+        "--seed", "42",
+    ])
+    try:
+        await _wait_for_server(f"http://127.0.0.1:{FAKE_PORT}/chargingws/v2/check-api")
+        for size in args.sizes:
+            await run_size(args, size, engine)
+    finally:
+        server.terminate()
+        server.wait()
+        await async_engine.dispose()
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[1_000, 10_000, 100_000])
+    parser.add_argument("--submissions", type=int, default=500)
+    parser.add_argument("--submitters", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=0, help="Giới hạn request/giây (0: không giới hạn)")
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--jitter", type=float, default=0.002)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--statuses", default="99:0.5,1:0.4,2:0.05,3:0.05")
+    parser.add_argument("--verbose", action="store_true", help="Hiện log của bot trong lúc chạy")
+    args = parser.parse_args()
+
+    # Database tạm, không dùng DATABASE_URL của bot
+    tmp_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ.setdefault("PARTNER_ID", "bench")
+    os.environ.setdefault("PARTNER_KEY", "bench")
+
+    stdout = sys.stdout
+    args.report = lambda line: print(line, file=stdout, flush=True)
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        sys.stdout = stdout
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: tra cứu phí bằng cách quét danh sách thô (cách cũ) so với FeeIndex
+
+Chạy: python -m benchmarks.bench_fee_index [số nhà mạng] [số mệnh giá]
+"""
+
+import random
+import sys
+import timeit
+
+from services.card2k.fee_index import FeeIndex
+
+
+def build_fee_table(telco_count: int, amount_count: int) -> list:
+    """
+    Tạo bảng phí giả lập
+    """
+
+    rng = random.Random(42)
+    return [
+        {"telco": f"TELCO{t}", "value": 10_000 * (a + 1), "fees": round(rng.uniform(8, 30), 2)}
+        for t in range(telco_count)
+        for a in range(amount_count)
+    ]
+
+
+# Cách cũ: quét lại toàn bộ danh sách ở mỗi lần gọi
+def legacy_cheapest_telco_rate(data_api: list) -> dict:
+    valid_items = [item for item in data_api if item.get("fees") is not None]
+    min_item = min(valid_items, key=lambda item: item["fees"])
+    return {"telco_min": min_item.get("telco"), "fee_min": int(min_item["fees"] * 10) / 10}
+
+
+def legacy_min_fees_by_telco(data_api: list) -> dict:
+    telco_min_fees = {}
+    for item in data_api:
+        telco = item.get("telco")
+        fee = item.get("fees")
+        if telco is None or fee is None:
+            continue
+        if telco not in telco_min_fees or fee < telco_min_fees[telco]:
+            telco_min_fees[telco] = int(fee * 10) / 10
+    return dict(sorted(telco_min_fees.items(), key=lambda item: item[1]))
+
+
+def legacy_telco_fee_info(data_api: list, telco: str) -> dict:
+    fee_dict = {}
+    for item in data_api:
+        if str(item.get("telco")).upper() == str(telco).upper():
+            fee_dict[str(item.get("value"))] = item.get("fees")
+    min_fee = min(fee_dict.values())
+    min_amount = next(int(amount) for amount, fee in fee_dict.items() if fee == min_fee)
+    return {"fee_min": min_fee, "amount_min": min_amount, "list_fee": fee_dict}
+
+
+def _report(name: str, legacy_seconds: float, index_seconds: float, number: int) -> None:
+    legacy_us = legacy_seconds / number * 1e6
+    index_us = index_seconds / number * 1e6
+    print(f"{name:<24} legacy {legacy_us:>10.2f} us | index {index_us:>8.3f} us | x{legacy_us / index_us:,.0f}")
+
+
+def main(telco_count: int = 50, amount_count: int = 40, number: int = 2000) -> None:
+    data_api = build_fee_table(telco_count, amount_count)
+    build_seconds = timeit.timeit(lambda: FeeIndex.build(data_api), number=20) / 20
+    index = FeeIndex.build(data_api)
+
+    # Kết quả phải giống nhau trước khi so sánh tốc độ
+    assert dict(index.cheapest_telco_rate) == legacy_cheapest_telco_rate(data_api)
+    assert dict(index.min_fees_by_telco) == legacy_min_fees_by_telco(data_api)
+    assert index.get_telco_fee_info("telco7")["fee_min"] == legacy_telco_fee_info(data_api, "telco7")["fee_min"]
+
+    print(f"Bảng phí: {telco_count} nhà mạng x {amount_count} mệnh giá = {len(data_api)} dòng")
+    print(f"Biên dịch FeeIndex: {build_seconds * 1e3:.2f} ms / bản cache\n")
+
+    _report(
+        "cheapest_telco_rate",
+        timeit.timeit(lambda: legacy_cheapest_telco_rate(data_api), number=number),
+        timeit.timeit(lambda: index.cheapest_telco_rate, number=number),
+        number,
+    )
+    _report(
+        "min_fees_by_telco",
+        timeit.timeit(lambda: legacy_min_fees_by_telco(data_api), number=number),
+        timeit.timeit(lambda: index.min_fees_by_telco, number=number),
+        number,
+    )
+    _report(
+        "telco_fee_info",
+        timeit.timeit(lambda: legacy_telco_fee_info(data_api, "telco7"), number=number),
+        timeit.timeit(lambda: index.get_telco_fee_info("telco7"), number=number),
+        number,
+    )
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,298 @@
+"""
+Benchmark lệnh slash /nap_the_cao với interaction giả lập (không kết nối Discord)
+
+Mỗi người dùng giả lập:
+    - Gọi NapTheCao.nap_the_cao_command, chờ embed xác nhận
+    - Bấm ConfirmationView.confirm_button, chạy process_card_exchange đến khi gửi embed chờ xử lý
+
+Đo:
+    - Thời gian phản hồi đầu tiên (tính từ lúc interaction được tạo) của lệnh và của nút xác nhận,
+      so với hạn 3 giây của Discord
+    - Thời gian gửi thẻ trọn vẹn (từ lúc bấm xác nhận đến khi xong process_card_exchange)
+    - Các lần event loop bị nghẽn (chênh lệch giữa thời gian ngủ dự kiến và thực tế)
+
+Có thể chạy kèm chu kỳ kiểm tra thẻ của NapTheCaoTask (--pending) để đo ảnh hưởng của poller lên lệnh.
+
+Chạy: python -m benchmarks.bench_interactions [--rate 20] [--duration 30] [--pending 0] [--concurrency 50]
+      [--latency 0.05] [--discord-latency 0.05] [--think 0] [--stall-threshold 0.1]
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from benchmarks.bench_e2e import FAKE_PORT, _BenchBot, _percentile, _seed_pending_cards, _summary, _wait_for_server
+
+# Hạn phản hồi interaction của Discord (giây)
+INTERACTION_DEADLINE = 3.0
+
+_ids = itertools.count(10**17)
+
+
+class _Response:
+    """
+    InteractionResponse giả lập: ghi lại thời điểm phản hồi đầu tiên
+    """
+
+    def __init__(self, interaction, latency: float):
+        self.interaction = interaction
+        self.latency = latency
+        self.kwargs = None
+
+    async def _respond(self, **kwargs) -> None:
+        if self.interaction.responded_at is None:
+            self.interaction.responded_at = time.perf_counter()
+            self.kwargs = kwargs
+        await asyncio.sleep(self.latency)
+
+    async def send_message(self, content=None, **kwargs) -> None:
+        await self._respond(content=content, **kwargs)
+
+    async def edit_message(self, **kwargs) -> None:
+        await self._respond(**kwargs)
+
+    async def defer(self, **kwargs) -> None:
+        await self._respond(**kwargs)
+
+    def is_done(self) -> bool:
+        return self.interaction.responded_at is not None
+
+
+class _Followup:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def send(self, content=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(id=next(_ids))
+
+
+class _Interaction:
+    """
+    discord.Interaction tối giản cho lệnh nạp thẻ
+    """
+
+    def __init__(self, user, channel, latency: float, created_at: float = None):
+        self.created_at = created_at or time.perf_counter()
+        self.responded_at = None
+        self.user = user
+        self.channel = channel
+        self.response = _Response(self, latency)
+        self.followup = _Followup(latency)
+
+    @property
+    def first_response(self) -> float:
+        return (self.responded_at or time.perf_counter()) - self.created_at
+
+
+class _StallMonitor:
+    """
+    Phát hiện event loop bị nghẽn: ngủ interval giây và đo độ trễ khi được đánh thức lại
+    """
+
+    def __init__(self, interval: float = 0.01, threshold: float = 0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self.lags = []
+        self.stalls = []
+        self._task = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - started_at - self.interval
+            self.lags.append(lag)
+            if lag >= self.threshold:
+                self.stalls.append(lag)
+
+
+async def _user_session(cog, index: int, arrived_at: float, args, results: dict) -> None:
+    """
+    Một người dùng: gọi lệnh, chờ phản hồi rồi bấm xác nhận
+
+    arrived_at là thời điểm interaction đến theo lịch, tính cả thời gian chờ event loop
+    """
+
+    user = SimpleNamespace(id=1000 + index, guild_permissions=SimpleNamespace(administrator=True))
+    channel = SimpleNamespace(id=1)
+    code, serial = f"{index:013d}", f"{index:011d}"
+
+    command = _Interaction(user, channel, args.discord_latency, created_at=arrived_at)
+    try:
+        await cog.nap_the_cao_command.callback(cog, command, "viettel", 10_000, code, serial)
+    except Exception as e:
+        results["errors"].append(repr(e))
+        return
+    results["command"].append(command.first_response)
+
+    view = (command.response.kwargs or {}).get("view")
+    if view is None:
+        results["errors"].append("Lệnh không trả về nút xác nhận")
+        return
+
+    if args.think > 0:
+        await asyncio.sleep(args.think)
+
+    button = _Interaction(user, channel, args.discord_latency)
+    try:
+        await view.confirm_button.callback(button)
+    except Exception as e:
+        results["errors"].append(repr(e))
+        return
+    results["confirm"].append(button.first_response)
+    results["submission"].append(time.perf_counter() - button.created_at)
+    view.stop()
+
+
+async def main_async(args) -> None:
+    import database.models  # noqa: F401 (đăng ký các bảng vào Base.metadata)
+    from api.card2k.exchange_card import ExchangeCard
+    from api.card2k.rate_limiter import RateLimiter
+    from cogs.nap_the_cao import NapTheCao
+    from database.base import Base
+    from database.migrations import run_migrations
+    from database.session import async_engine, engine
+    from helpers.console import logger
+    from services.card2k.card_poller import CardPoller
+    from tasks.nap_the_cao_task import NapTheCaoTask
+
+    # Không ghi log benchmark vào file log của bot
+    logger.enable_file_logging = False
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    _seed_pending_cards(engine, args.pending)
+
+    server = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_card2k",
+        "--port", str(FAKE_PORT),
+        "--latency", str(args.latency),
+        "--jitter", str(args.latency / 2),
+        "--seed", "42",
+    ])
+    api = None
+    poller = None
+    try:
+        await _wait_for_server(f"http://127.0.0.1:{FAKE_PORT}/chargingws/v2/check-api")
+
+        api = ExchangeCard()
+        api.provider = f"http://127.0.0.1:{FAKE_PORT}"
+        api.rate_limiter = RateLimiter(rate=args.rate_limit, burst=args.rate_limit)
+        api.pool_size = api.pool_size_per_host = args.concurrency + 20
+
+        bot = _BenchBot(api)
+        cog = NapTheCao(bot)
+        cog.enabled = True
+        if args.pending:
+            poller = NapTheCaoTask(bot)
+            poller.poller = CardPoller(api, concurrency=args.concurrency)
+            bot.get_cog = lambda name: poller if name == "NapTheCaoTask" else None
+
+        results = {"command": [], "confirm": [], "submission": [], "errors": []}
+        monitor = _StallMonitor(threshold=args.stall_threshold)
+        monitor.start()
+
+        # Chu kỳ kiểm tra thẻ chạy song song với các lệnh
+        poll_task = asyncio.create_task(poller.check_history_exchange_card()) if poller is not None else None
+
+        # Người dùng đến đều đặn theo --rate, đặt lịch theo thời gian tuyệt đối để không bị trôi khi loop nghẽn
+        total = int(args.rate * args.duration)
+        sessions = []
+        started_at = time.perf_counter()
+        for index in range(total):
+            arrived_at = started_at + index / args.rate
+            delay = arrived_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            sessions.append(asyncio.create_task(_user_session(cog, index, arrived_at, args, results)))
+        await asyncio.gather(*sessions)
+        elapsed = time.perf_counter() - started_at
+
+        if poll_task is not None:
+            await poll_task
+        await monitor.stop()
+    finally:
+        if poller is not None:
+            await poller.cog_unload()
+        if api is not None:
+            await api.close()
+        server.terminate()
+        server.wait()
+        await async_engine.dispose()
+        engine.dispose()
+
+    late = [
+        seconds
+        for seconds in itertools.chain(results["command"], results["confirm"])
+        if seconds > INTERACTION_DEADLINE
+    ]
+    report = args.report
+    report(
+        f"{total} lượt /nap_the_cao ({args.rate:g}/s trong {args.duration:g}s, xong sau {elapsed:.1f}s), "
+        f"{args.pending:,} thẻ chờ kiểm tra song song"
+    )
+    report(f"  Phản hồi lệnh:        {_summary(results['command'])}, max {max(results['command'], default=0) * 1e3:.0f} ms")
+    report(f"  Phản hồi xác nhận:    {_summary(results['confirm'])}, max {max(results['confirm'], default=0) * 1e3:.0f} ms")
+    report(f"  Gửi thẻ trọn vẹn:     {_summary(results['submission'])}")
+    report(
+        f"  Event loop:           trễ p99 {_percentile(monitor.lags, 99) * 1e3:.1f} ms, max {max(monitor.lags, default=0) * 1e3:.1f} ms, "
+        f"{len(monitor.stalls)} lần nghẽn >= {args.stall_threshold * 1e3:.0f} ms"
+    )
+    report(f"  Lỗi: {len(results['errors'])}" + (f" (ví dụ: {results['errors'][0]})" if results["errors"] else ""))
+    report(
+        f"  Hạn {INTERACTION_DEADLINE:.0f}s: " + ("đạt" if not late else f"KHÔNG ĐẠT ({len(late)} phản hồi trễ hạn)")
+    )
+    args.failed = bool(late or results["errors"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=20, help="Số lượt /nap_the_cao mỗi giây")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--pending", type=int, default=0, help="Số thẻ chờ kiểm tra chạy song song (0: không chạy poller)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rate-limit", type=float, default=0, help="Giới hạn request card2k/giây (0: không giới hạn)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Độ trễ của card2k giả lập (giây)")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="Độ trễ giả lập mỗi lần gọi Discord (giây)")
+    parser.add_argument("--think", type=float, default=0, help="Thời gian người dùng chờ trước khi bấm xác nhận (giây)")
+    parser.add_argument("--stall-threshold", type=float, default=0.1)
+    parser.add_argument("--verbose", action="store_true", help="Hiện log của bot trong lúc chạy")
+    args = parser.parse_args()
+
+    # Database tạm, không dùng DATABASE_URL của bot
+    tmp_dir = tempfile.mkdtemp(prefix="bench_interactions_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ.setdefault("PARTNER_ID", "bench")
+    os.environ.setdefault("PARTNER_KEY", "bench")
+
+    stdout = sys.stdout
+    args.report = lambda line: print(line, file=stdout, flush=True)
+    args.failed = False
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        sys.stdout = stdout
+    sys.exit(1 if args.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Kiểm tra chế độ callback: nhà cung cấp giả lập gửi callback có chữ ký đến CallbackServer của NapTheCaoTask
+
+Các trường hợp:
+    - Sai chữ ký: bị từ chối (403), thẻ vẫn chờ
+    - Status 99: thẻ vẫn chờ, chưa cập nhật Discord
+    - Thẻ thành công: thẻ được cập nhật trong database và Discord message được sửa một lần
+    - Callback lặp lại: trả "duplicate", không cập nhật Discord lần nữa
+    - Callback lặp lại sau khi server khởi động lại (mất danh sách đã xử lý) với trạng thái khác:
+      không ghi đè trạng thái cuối cùng, không cập nhật Discord
+    - request_id không tồn tại: 404
+
+Chạy: python -m benchmarks.check_callbacks [--verbose]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+
+import aiohttp
+
+from benchmarks.bench_e2e import _BenchBot, _Channel, _Message, _seed_pending_cards
+
+CALLBACK_PORT = 18766
+PARTNER_KEY = "check-callbacks"
+
+
+class _RecordingMessage(_Message):
+    def __init__(self, message_id: int, edits: list):
+        super().__init__(message_id)
+        self.edits = edits
+
+    async def edit(self, **kwargs) -> None:
+        self.edits.append(self.id)
+
+
+class _RecordingChannel(_Channel):
+    def __init__(self, channel_id: int, edits: list):
+        super().__init__(channel_id)
+        self.edits = edits
+
+    def get_partial_message(self, message_id: int) -> _RecordingMessage:
+        return _RecordingMessage(message_id, self.edits)
+
+
+class _CallbackBot(_BenchBot):
+    """
+    Bot tối giản ghi lại các message được sửa
+    """
+
+    def __init__(self):
+        super().__init__(api=None)
+        self.edits = []
+
+    def get_partial_messageable(self, channel_id: int) -> _RecordingChannel:
+        return _RecordingChannel(channel_id, self.edits)
+
+
+def _callback_payload(index: int, status: int, sign: str = None) -> dict:
+    """
+    Dữ liệu callback như nhà cung cấp gửi cho thẻ seed-{index} (mã thẻ, serial theo _seed_pending_cards)
+    """
+
+    code, serial = f"{index:013d}", f"{index:011d}"
+    return {
+        "request_id": f"seed-{index}",
+        "status": str(status),
+        "declared_value": "10000",
+        "value": "10000",
+        "message": "Thẻ đã được sử dụng" if status == 3 else "",
+        "code": code,
+        "serial": serial,
+        "telco": "VIETTEL",
+        "callback_sign": sign or hashlib.md5(f"{PARTNER_KEY}{code}{serial}".encode()).hexdigest(),
+    }
+
+
+async def _post(session: aiohttp.ClientSession, payload: dict) -> tuple:
+    async with session.post(f"http://127.0.0.1:{CALLBACK_PORT}/callback", data=payload) as response:
+        return response.status, await response.json(content_type=None)
+
+
+async def main_async(args) -> None:
+    import database.models  # noqa: F401 (đăng ký các bảng vào Base.metadata)
+    from sqlalchemy import select
+
+    from api.card2k.callback_server import CallbackServer
+    from database.base import Base
+    from database.migrations import run_migrations
+    from database.models import HistoryExchangeCard
+    from database.session import async_engine, engine, session_scope
+    from helpers.console import logger
+    from tasks.nap_the_cao_task import NapTheCaoTask
+
+    logger.enable_file_logging = False
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    _seed_pending_cards(engine, 2)
+
+    bot = _CallbackBot()
+    task = NapTheCaoTask(bot)
+
+    async def card_status(index: int) -> str:
+        async with session_scope() as session:
+            return await session.scalar(
+                select(HistoryExchangeCard.status).where(HistoryExchangeCard.request_id == f"seed-{index}")
+            )
+
+    def start_server() -> CallbackServer:
+        return CallbackServer(handler=task.handle_callback, partner_key=PARTNER_KEY, host="127.0.0.1", port=CALLBACK_PORT)
+
+    def check(name: str, ok: bool, detail: str = "") -> None:
+        args.report(f"  [{'OK' if ok else 'LỖI'}] {name}" + (f" ({detail})" if detail and not ok else ""))
+        if not ok:
+            args.failed = True
+
+    server = start_server()
+    await server.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            status, _ = await _post(session, _callback_payload(0, 1, sign="0" * 32))
+            check("Sai chữ ký bị từ chối", status == 403 and await card_status(0) == "pending", f"HTTP {status}")
+
+            status, _ = await _post(session, _callback_payload(1, 99))
+            check("Status 99 giữ thẻ ở trạng thái chờ", status == 200 and await card_status(1) == "pending" and not bot.edits)
+
+            status, _ = await _post(session, _callback_payload(0, 1))
+            check(
+                "Callback thành công cập nhật thẻ và Discord",
+                status == 200 and await card_status(0) == "success" and len(bot.edits) == 1,
+                f"HTTP {status}, {await card_status(0)}, {len(bot.edits)} lần sửa message",
+            )
+
+            status, body = await _post(session, _callback_payload(0, 1))
+            check("Callback lặp lại bị bỏ qua", status == 200 and body.get("message") == "duplicate" and len(bot.edits) == 1)
+
+            # Server khởi động lại: danh sách callback đã xử lý bị mất, database phải chặn ghi đè
+            await server.stop()
+            server = start_server()
+            await server.start()
+            status, _ = await _post(session, _callback_payload(0, 3))
+            check(
+                "Callback lặp lại sau khởi động lại không ghi đè kết quả",
+                status == 200 and await card_status(0) == "success" and len(bot.edits) == 1,
+                f"HTTP {status}, {await card_status(0)}, {len(bot.edits)} lần sửa message",
+            )
+
+            payload = _callback_payload(0, 1)
+            payload["request_id"] = "khong-ton-tai"
+            status, _ = await _post(session, payload)
+            check("request_id không tồn tại trả 404", status == 404, f"HTTP {status}")
+    finally:
+        await server.stop()
+        await task.cog_unload()
+        await async_engine.dispose()
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verbose", action="store_true", help="Hiện log của bot trong lúc chạy")
+    args = parser.parse_args()
+
+    # Database tạm, không dùng DATABASE_URL của bot
+    tmp_dir = tempfile.mkdtemp(prefix="check_callbacks_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'check.db')}"
+    os.environ.setdefault("PARTNER_ID", "check")
+    os.environ["PARTNER_KEY"] = PARTNER_KEY
+
+    stdout = sys.stdout
+    args.report = lambda line: print(line, file=stdout, flush=True)
+    args.failed = False
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        sys.stdout = stdout
+    sys.exit(1 if args.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
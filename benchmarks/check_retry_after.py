@@ -0,0 +1,104 @@
+"""
+Kiểm tra ExchangeCard chờ hết Retry-After trước khi gửi lại request bị 429
+
+Server giả lập trả 429 kèm Retry-After cho request đầu tiên, sau đó trả kết quả bình thường.
+Kiểm tra với rate limiter tắt (rate: 0, không giới hạn) và bật: khoảng cách giữa hai request
+phải tối thiểu bằng Retry-After.
+
+Chạy: python -m benchmarks.check_retry_after [--retry-after 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import web
+
+CHECK_PORT = 18767
+
+
+class _ThrottlingProvider:
+    """
+    check-api trả 429 cho request đầu tiên, các request sau trả trạng thái hoạt động
+    """
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        self.requested_at = []
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/chargingws/v2/check-api", self._handle)
+        return app
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requested_at.append(time.monotonic())
+        if len(self.requested_at) == 1:
+            return web.json_response({"status": "error"}, status=429, headers={"Retry-After": str(self.retry_after)})
+        return web.json_response({"status": "success", "data": {"status": "active"}})
+
+
+async def _run_case(rate: float, retry_after: float) -> tuple:
+    from api.card2k.exchange_card import ExchangeCard
+    from api.card2k.rate_limiter import RateLimiter
+
+    provider = _ThrottlingProvider(retry_after)
+    runner = web.AppRunner(provider.build_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", CHECK_PORT).start()
+
+    api = ExchangeCard()
+    api.provider = f"http://127.0.0.1:{CHECK_PORT}"
+    api.rate_limiter = RateLimiter(rate=rate)
+    api.retry_on_429 = 1
+    try:
+        result = await api.check_status_api()
+    finally:
+        await api.close()
+        await runner.cleanup()
+
+    gap = provider.requested_at[1] - provider.requested_at[0] if len(provider.requested_at) == 2 else None
+    return result, gap
+
+
+async def main_async(args) -> None:
+    from helpers.console import logger
+
+    logger.enable_file_logging = False
+
+    for rate in (0, 100):
+        result, gap = await _run_case(rate, args.retry_after)
+        ok = result is True and gap is not None and gap >= args.retry_after - 0.01
+        args.report(
+            f"  [{'OK' if ok else 'LỖI'}] rate: {rate:g}, Retry-After {args.retry_after:g}s -> "
+            + (f"gửi lại sau {gap:.2f}s" if gap is not None else "không gửi lại")
+        )
+        if not ok:
+            args.failed = True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--verbose", action="store_true", help="Hiện log của bot trong lúc chạy")
+    args = parser.parse_args()
+
+    os.environ.setdefault("PARTNER_ID", "check")
+    os.environ.setdefault("PARTNER_KEY", "check")
+
+    stdout = sys.stdout
+    args.report = lambda line: print(line, file=stdout, flush=True)
+    args.failed = False
+    if not args.verbose:
+        sys.stdout = open(os.devnull, "w")
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        sys.stdout = stdout
+    sys.exit(1 if args.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Server card2k giả lập chạy local, dùng cho benchmark và thử nghiệm không cần gọi card2k thật
+
+Hỗ trợ:
+    - /chargingws/v2 (command=charging, command=check)
+    - /chargingws/v2/getfee
+    - /chargingws/v2/check-api
+    - Gửi callback trạng thái thẻ (--callback-url)
+
+Chạy: python -m benchmarks.fake_card2k [--port 18080] [--latency 0.02] [--jitter 0.01]
+      [--error-rate 0.01] [--maintenance-rate 0] [--statuses 99:0.5,1:0.4,2:0.05,3:0.05]
+      [--callback-url http://127.0.0.1:8080/callback --callback-delay 1] [--partner-key key]
+
+Trỏ bot vào server giả lập: đặt provider: "http://127.0.0.1:18080" trong configs/settings.yml
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import random
+from typing import Dict, Optional
+
+import aiohttp
+from aiohttp import web
+
+DEFAULT_STATUSES = {99: 0.5, 1: 0.4, 2: 0.05, 3: 0.05}
+DEFAULT_TELCOS = ("VIETTEL", "VINAPHONE", "MOBIFONE", "VIETNAMOBILE", "GARENA", "ZING", "VCOIN", "GATE")
+DEFAULT_AMOUNTS = (10_000, 20_000, 30_000, 50_000, 100_000, 200_000, 300_000, 500_000, 1_000_000)
+
+
+def parse_statuses(value: str) -> Dict[int, float]:
+    """
+    Đọc phân phối trạng thái dạng "99:0.5,1:0.4,2:0.05,3:0.05"
+    """
+
+    statuses = {}
+    for item in value.split(","):
+        status, weight = item.split(":")
+        statuses[int(status)] = float(weight)
+    return statuses
+
+
+class FakeCard2k:
+    """
+    Server card2k giả lập
+
+    - latency, jitter: thời gian phản hồi (giây) = latency ± jitter
+    - error_rate: tỷ lệ trả HTTP 500
+    - maintenance_rate: tỷ lệ trả status 4 (bảo trì)
+    - statuses: phân phối trạng thái khi kiểm tra thẻ (99: đang xử lý, 1: thành công, 2: sai mệnh giá, 3: thất bại)
+    - callback_url: nếu có, gửi callback khi thẻ có kết quả (sau callback_delay giây)
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.02,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        maintenance_rate: float = 0.0,
+        statuses: Optional[Dict[int, float]] = None,
+        partner_key: str = "",
+        callback_url: Optional[str] = None,
+        callback_delay: float = 1.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.maintenance_rate = maintenance_rate
+        self.statuses = statuses or dict(DEFAULT_STATUSES)
+        self.partner_key = partner_key
+        self.callback_url = callback_url
+        self.callback_delay = callback_delay
+        self.random = random.Random(seed)
+
+        self._transaction_ids = itertools.count(1)
+        # request_id -> thông tin thẻ và kết quả cuối cùng (nếu đã có)
+        self.cards: Dict[str, dict] = {}
+        self.requests = {"charging": 0, "check": 0, "getfee": 0, "check_api": 0}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._background: set = set()
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/chargingws/v2", self._handle_charging)
+        app.router.add_get("/chargingws/v2/getfee", self._handle_getfee)
+        app.router.add_get("/chargingws/v2/check-api", self._handle_check_api)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _delay(self) -> None:
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _fault(self) -> Optional[web.Response]:
+        """
+        Lỗi giả lập: HTTP 500 hoặc bảo trì (status 4)
+        """
+
+        if self.random.random() < self.error_rate:
+            return web.json_response({"status": 500, "message": "Internal Server Error"}, status=500)
+        if self.random.random() < self.maintenance_rate:
+            return web.json_response({"status": 4, "message": "Hệ thống bảo trì"})
+        return None
+
+    def _pick_status(self) -> int:
+        statuses = list(self.statuses)
+        return self.random.choices(statuses, weights=[self.statuses[status] for status in statuses])[0]
+
+    async def _handle_charging(self, request: web.Request) -> web.Response:
+        payload = dict(request.query)
+        if request.method == "POST":
+            payload.update(await request.json())
+
+        await self._delay()
+        fault = self._fault()
+        if fault is not None:
+            return fault
+
+        if payload.get("command") == "check":
+            self.requests["check"] += 1
+            return web.json_response(self._check(payload))
+
+        self.requests["charging"] += 1
+        return web.json_response(self._charge(payload))
+
+    def _card(self, payload: dict) -> dict:
+        request_id = str(payload.get("request_id"))
+        card = self.cards.get(request_id)
+        if card is None:
+            card = self.cards[request_id] = {
+                "request_id": request_id,
+                "trans_id": str(next(self._transaction_ids)),
+                "telco": payload.get("telco"),
+                "code": payload.get("code"),
+                "serial": payload.get("serial"),
+                "value": int(payload.get("amount") or 0),
+                "status": 99,
+            }
+        return card
+
+    def _charge(self, payload: dict) -> dict:
+        card = self._card(payload)
+        if self.callback_url:
+            self._spawn(self._send_callback(card))
+        return {
+            "status": 99,
+            "message": "Chờ xử lý",
+            "request_id": card["request_id"],
+            "trans_id": card["trans_id"],
+            "value": card["value"],
+            "declared_value": card["value"],
+        }
+
+    def _check(self, payload: dict) -> dict:
+        card = self._card(payload)
+        if card["status"] == 99:
+            card["status"] = self._pick_status()
+        return self._result(card)
+
+    def _result(self, card: dict) -> dict:
+        status = card["status"]
+        messages = {99: "Chờ xử lý", 1: "Thành công", 2: "Sai mệnh giá", 3: "Thẻ lỗi"}
+        declared_value = {1: card["value"], 2: card["value"] // 2}.get(status, 0)
+        return {
+            "status": status,
+            "message": messages.get(status, "Không xác định"),
+            "request_id": card["request_id"],
+            "trans_id": card["trans_id"],
+            "value": card["value"],
+            "declared_value": declared_value,
+            "amount": declared_value,
+        }
+
+    async def _handle_getfee(self, request: web.Request) -> web.Response:
+        await self._delay()
+        fault = self._fault()
+        if fault is not None:
+            return fault
+
+        self.requests["getfee"] += 1
+        rng = random.Random(0)
+        data = [
+            {"telco": telco, "value": amount, "fees": round(rng.uniform(10, 30), 1)}
+            for telco in DEFAULT_TELCOS
+            for amount in DEFAULT_AMOUNTS
+        ]
+        return web.json_response(data)
+
+    async def _handle_check_api(self, request: web.Request) -> web.Response:
+        await self._delay()
+        self.requests["check_api"] += 1
+        if self.random.random() < self.error_rate:
+            return web.json_response({"status": 500, "message": "Internal Server Error"}, status=500)
+        status = "maintenance" if self.random.random() < self.maintenance_rate else "active"
+        return web.json_response({"status": "success", "data": {"status": status}})
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.create_task(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _send_callback(self, card: dict) -> None:
+        """
+        Gửi kết quả thẻ đến callback_url sau callback_delay giây
+        """
+
+        await asyncio.sleep(self.callback_delay)
+        while card["status"] == 99:
+            card["status"] = self._pick_status()
+            if card["status"] == 99:
+                await asyncio.sleep(self.callback_delay)
+
+        payload = self._result(card)
+        payload.update({
+            "code": card["code"],
+            "serial": card["serial"],
+            "telco": card["telco"],
+            "callback_sign": hashlib.md5(f"{self.partner_key}{card['code']}{card['serial']}".encode()).hexdigest(),
+        })
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        try:
+            async with self._session.post(self.callback_url, data=payload) as response:
+                await response.read()
+        except aiohttp.ClientError:
+            pass
+
+    async def _on_cleanup(self, app: web.Application) -> None:
+        for task in list(self._background):
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--maintenance-rate", type=float, default=0.0)
+    parser.add_argument("--statuses", type=parse_statuses, default=dict(DEFAULT_STATUSES))
+    parser.add_argument("--partner-key", default="")
+    parser.add_argument("--callback-url")
+    parser.add_argument("--callback-delay", type=float, default=1.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    fake = FakeCard2k(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        maintenance_rate=args.maintenance_rate,
+        statuses=args.statuses,
+        partner_key=args.partner_key,
+        callback_url=args.callback_url,
+        callback_delay=args.callback_delay,
+        seed=args.seed,
+    )
+    web.run_app(fake.build_app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
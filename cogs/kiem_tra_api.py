@@ -5,7 +5,6 @@ from discord.ext import commands
 
 from utils.embed import error_embed, create_embed, EmbedColor
 from utils.embed import error_embed, disabled_command_embed
-from api.card2k.exchange_card import ExchangeCard as ExchangeCardAPI
 from utils.config import get_config_value
 from helpers.console import logger
 
@@ -13,7 +12,7 @@ from helpers.console import logger
 class KiemTraAPI(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.exchange_card_api = ExchangeCardAPI()
+        self.exchange_card_api = bot.card2k_api
         self.enabled = get_config_value("commands.kiem_tra_api.enabled", False)
         self.only_admin = get_config_value("commands.kiem_tra_api.only_admin", False)
 
@@ -39,7 +38,7 @@ class KiemTraAPI(commands.Cog):
             return
 
         try:
-            kiem_tra_api_service = self.exchange_card_api.check_status_api()
+            kiem_tra_api_service = await self.exchange_card_api.check_status_api()
             description = ""
             if kiem_tra_api_service:
                 description = "🟢 API đang `hoạt động`"
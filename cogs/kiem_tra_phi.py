@@ -6,17 +6,23 @@ from discord.ext import commands
 
 from services.card2k.fee_service import FeeService
 from utils.embed import error_embed, disabled_command_embed
-from utils.config import get_config_value, get_config
+from utils.config import get_config_value, get_settings
 from helpers.console import logger
 
 
 class CheckFeeExchangeCard(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.fee_service = FeeService()
+        self.fee_service = FeeService(bot.card2k_api)
         self.enabled = get_config_value("commands.kiem_tra_phi.enabled", False)
         self.only_admin = get_config_value("commands.kiem_tra_phi.only_admin", False)
 
+    async def cog_load(self):
+        await self.fee_service.start()
+
+    async def cog_unload(self):
+        await self.fee_service.stop()
+
     @app_commands.command(
         name="kiem_tra_phi", 
         description=get_config_value("commands.kiem_tra_phi.description", "Kiểm tra phí đổi thẻ cào")
@@ -92,7 +98,7 @@ class CheckFeeExchangeCard(commands.Cog):
         Tạo embed phí nhỏ nhất đổi thẻ cào tất cả nhà mạng
         """
 
-        config = get_config()
+        config = get_settings()
         text_sub = ""
         for telco, fee in list_min_fees_by_telco.items():
             text_sub += f"> ▫️ ` {fee:.1f}% ` {telco} \n"
@@ -111,7 +117,7 @@ class CheckFeeExchangeCard(commands.Cog):
         Tạo embed phí nhỏ nhất
         """
 
-        config = get_config()
+        config = get_settings()
         embed = discord.Embed(
             description=f"[{datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}] \n\n **__Thông tin chính:__** \n > Nhà mạng phí **thấp nhất** **[{telco_min}]({config['url']['app']})** \n > Chiết khấu **[{fee_min:.1f}%]({config['url']['app']})** \n > vd: *{10000:,.0f} {telco_min} = {int(10000 * (1 - fee_min / 100)):,} vnđ*",
             color=discord.Color.from_str("#ffd154"),
@@ -123,7 +129,7 @@ class CheckFeeExchangeCard(commands.Cog):
         Tạo embed phí nhỏ nhất của mệnh giá
         """
 
-        config = get_config()
+        config = get_settings()
         embed = discord.Embed(
             description=f"[{datetime.datetime.now().strftime('%d/%m/%Y %H:%M')}] \n\n **{telco.upper()}** \n\n **__Thông tin chính:__** \n > Mệnh giá **thấp nhất** **[{amount_min:,.0f}]({config['url']['app']})** \n > Chiết khấu **[{fee_min:.1f}%]({config['url']['app']})** \n > vd: *{amount_min:,.0f} VNĐ = {int(amount_min * (1 - fee_min / 100)):,} vnđ*",
             color=discord.Color.from_str("#ffd154"),
@@ -135,7 +141,7 @@ class CheckFeeExchangeCard(commands.Cog):
         Tạo embed phí đổi thẻ cào theo nhà mạng
         """
 
-        config = get_config()
+        config = get_settings()
         text_sub = ""
         for amount, fee in list_fees_by_telco.items():
             text_sub += f"> ▫️ ` {int(amount):,} ` -> **{float(fee):.1f}%** \n"
@@ -3,23 +3,23 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-from database.models import HistoryExchangeCard
-from database.session import SessionLocal
-
-from utils.embed import error_embed, _add_footer, success_embed, disabled_command_embed
+from utils.embed import error_embed, success_embed, disabled_command_embed
 from utils.config import get_config_value
-from api.card2k.exchange_card import ExchangeCard as ExchangeCardAPI
 from helpers.console import logger
-from utils.string_utils import generate_uuid
+from services.card2k.card_validator import INVALID_AMOUNT, INVALID_TELCO, get_card_validator
+from services.card2k.poll_schedule import PollSchedule
+from services.card2k.submission_outbox import REJECTED, RETRY, SubmissionOutbox
+from services.discord.card_embeds import confirm_embed, waiting_embed
 
 
 class NapTheCao(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.nap_the_cao_service = ExchangeCardAPI()
+        self.nap_the_cao_service = bot.card2k_api
         self.enabled = get_config_value("commands.nap_the_cao.enabled", False)
         self.only_admin = get_config_value("commands.nap_the_cao.only_admin", False)
-        self.session = SessionLocal()
+        self.poll_schedule = PollSchedule.from_config()
+        self.submission_outbox = SubmissionOutbox(bot.card2k_api, self.poll_schedule)
 
     @app_commands.command(
         name="nap_the_cao",
@@ -76,24 +76,22 @@ class NapTheCao(commands.Cog):
             return
 
         try:
-            # Kiểm tra nhà mạng
-            if not self._check_telco(telco):
-                embed = error_embed(f"❌ Nhà mạng `{telco}` hiện không được hỗ trợ!")
-                await interaction.response.send_message(embed=embed, ephemeral=True)
-                return
-            # Kiểm tra mệnh giá
-            if not self._check_amount(telco, amount):
-                embed = error_embed(f"❌ Mệnh giá `{amount:,} VND` không được hỗ trợ!")
+            # Nhà cung cấp đang tạm ngắt: báo ngay, không gửi thẻ
+            # (chỉ đọc trạng thái ngắt mạch, request thăm dò do poller và outbox gửi để không trễ hạn 3 giây)
+            if not self.nap_the_cao_service.circuit_breaker.is_closed:
+                embed = error_embed(self._provider_unavailable_message())
                 await interaction.response.send_message(embed=embed, ephemeral=True)
                 return
-            # Kiểm tra code và serial
-            if not self._check_code_serial(telco, code, serial):
-                embed = error_embed(f"❌ Độ dài mã thẻ hoặc serial không hợp lệ!")
+
+            # Kiểm tra nhà mạng, mệnh giá, code và serial
+            validation_error = get_card_validator().validate(telco, amount, code, serial)
+            if validation_error is not None:
+                embed = error_embed(self._validation_error_message(validation_error, telco, amount))
                 await interaction.response.send_message(embed=embed, ephemeral=True)
                 return
 
             # Tạo embed xác nhận
-            embed = self._embed_confirm_nap_the_cao(telco, amount, code, serial)
+            embed = confirm_embed(telco, amount, code, serial)
             view = ConfirmationView(self, telco, amount, code, serial, interaction)
             await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
         except Exception as e:
@@ -101,103 +99,27 @@ class NapTheCao(commands.Cog):
             message_error = error_embed(f"Lỗi khi sử dụng lệnh, vui lòng thử lại sau.")
             await interaction.response.send_message(embed=message_error, ephemeral=True)
 
-    def _check_telco(self, telco: str) -> bool:
-        """
-        Kiểm tra nhà mạng có hợp lệ không
-        """
-
-        if not get_config_value("card_types", {}).get(telco, False):
-            return False
-        return True
-
-    def _check_amount(self, telco: str, amount: int) -> bool:
+    def _provider_unavailable_message(self) -> str:
         """
-        Kiểm tra mệnh giá có hợp lệ không
+        Nội dung thông báo khi nhà cung cấp đang tạm ngắt
         """
 
-        telco_amounts = get_config_value("card_amounts", {}).get(telco, {})
-        if amount not in telco_amounts or not telco_amounts[amount]:
-            return False
-        return True
+        breaker = self.nap_the_cao_service.circuit_breaker
+        minutes = max(1, int(breaker.retry_in // 60) + 1)
+        if breaker.reason == "maintenance":
+            return f"🛠️ Hệ thống nạp thẻ đang bảo trì, vui lòng thử lại sau khoảng {minutes} phút."
+        return f"⚠️ Hệ thống nạp thẻ đang gặp sự cố, vui lòng thử lại sau khoảng {minutes} phút."
 
-    def _check_code_serial(self, telco: str, code: str, serial: str) -> bool:
+    def _validation_error_message(self, validation_error: str, telco: str, amount: int) -> str:
         """
-        Kiểm tra code và serial có hợp lệ không
+        Nội dung thông báo theo mã lỗi kiểm tra thẻ
         """
 
-        telco_upper = telco.upper()
-        length_seri = len(serial)
-        length_pin = len(code)
-        format_dict = {
-            "VIETTEL": {"seri": [11, 14], "pin": [13, 15]},
-            "MOBIFONE": {"seri": [15], "pin": [12]},
-            "VINAPHONE": {"seri": [14], "pin": [14]},
-            "VNMOBI": {"seri": [16], "pin": [12]},
-            "VNMB": {"seri": [16], "pin": [12]},
-            "VIETNAMOBILE": {"seri": [16], "pin": [12]},
-            "GARENA": {"seri": [9], "pin": [16]},
-            "GARENA2": {"seri": [9], "pin": [16]},
-            "ZING": {"seri": [12], "pin": [9]},
-            "VCOIN": {"seri": [12], "pin": [12]},
-            "GATE": {"seri": [10], "pin": [10]},
-            "APPOTA": {"seri": [12], "pin": [12]},
-        }
-
-        if telco_upper not in format_dict:
-            return False
-
-        if not (serial.isalnum() and code.isalnum()):
-            return False
-
-        seri_valid = length_seri in format_dict[telco_upper]["seri"]
-        pin_valid = length_pin in format_dict[telco_upper]["pin"]
-
-        if not (seri_valid and pin_valid):
-            return False
-
-        return True
-    
-    def _embed_confirm_nap_the_cao(self, telco: str, amount: int, code: str, serial: str) -> discord.Embed:
-        """
-        Tạo embed xác nhận nạp thẻ cào
-        """
-        
-        embed = discord.Embed(
-            title="🔍 Xác nhận thông tin thẻ cào",
-            description="Vui lòng kiểm tra kỹ thông tin trước khi xác nhận:",
-            color=discord.Color.blue(),
-        )
-        embed.add_field(name="Nhà mạng", value=telco.capitalize(), inline=True)
-        embed.add_field(name="Mệnh giá", value=f"{amount:,} VND", inline=True)
-        embed.add_field(name="⠀", value="⠀", inline=True)  # Spacer
-        embed.add_field(name="Mã thẻ", value=f"||{code}||", inline=True)
-        embed.add_field(name="Serial", value=f"||{serial}||", inline=True)
-        embed.add_field(name="⠀", value="⠀", inline=True)  # Spacer
-        embed.add_field(
-            name="⚠️ Lưu ý", 
-            value="• Vui lòng kiểm tra kỹ thông tin trước khi xác nhận\n• Nhấn **Xác nhận** để tiếp tục hoặc **Hủy** để dừng lại", 
-            inline=False
-        )
-        embed = _add_footer(embed)
-        return embed
-
-    def _embed_waiting_for_processing(self, telco: str, amount: int, code: str, serial: str, trans_id: str) -> discord.Embed:
-        """
-        Tạo embed thông báo đang xử lý thẻ cào
-        """
-        
-        embed = discord.Embed(
-            title="⏳ Thẻ cào đang được xử lý",
-            description="Hệ thống đã tiếp nhận yêu cầu của bạn và đang xử lý...",
-            color=discord.Color.yellow(),
-        )
-        embed.add_field(name="Nhà mạng", value=telco, inline=True)
-        embed.add_field(name="Mệnh giá", value=f"{amount:,} VND", inline=True)
-        embed.add_field(name="Mã giao dịch", value=f"`{trans_id}`", inline=True)
-        # embed.add_field(name="Mã thẻ", value=f"||{code}||", inline=True)
-        embed.add_field(name="Serial", value=f"||{serial}||", inline=True)
-        embed = _add_footer(embed)
-        return embed
+        if validation_error == INVALID_TELCO:
+            return f"❌ Nhà mạng `{telco}` hiện không được hỗ trợ!"
+        if validation_error == INVALID_AMOUNT:
+            return f"❌ Mệnh giá `{amount:,} VND` không được hỗ trợ!"
+        return "❌ Độ dài mã thẻ hoặc serial không hợp lệ!"
 
     async def process_card_exchange(self, interaction: discord.Interaction, telco: str, amount: int, code: str, serial: str):
         """
@@ -205,49 +127,57 @@ class NapTheCao(commands.Cog):
         """
 
         try:
-            # Gửi thẻ lên API
-            data = {
-                "telco": telco,
-                "code": code,
-                "serial": serial,
-                "amount": amount,
-                "request_id": generate_uuid(True),
-            }
-            response = self.nap_the_cao_service.exchange_card(data)
+            # Nhà cung cấp vừa bị tạm ngắt trong lúc người dùng xác nhận
+            if not self.nap_the_cao_service.circuit_breaker.is_closed:
+                await interaction.followup.send(embed=error_embed(self._provider_unavailable_message()), ephemeral=True)
+                return
+
+            # Lưu yêu cầu trước khi gửi thẻ lên API (gửi lại tự động nếu lỗi mạng hoặc bot dừng giữa chừng)
+            submission = await self.submission_outbox.enqueue(
+                telco=telco,
+                amount=amount,
+                code=code,
+                serial=serial,
+                user_discord_id=str(interaction.user.id),
+                channel_discord_id=str(interaction.channel.id),
+            )
+            result = await self.submission_outbox.deliver(submission)
 
             # Kiểm tra kết quả
-            if response is None:
-                await interaction.followup.send(embed=error_embed("API lỗi, vui lòng liên hệ admin."), ephemeral=True)
+            if result.outcome == RETRY:
+                await self.submission_outbox.mark_retry(submission, result)
+                await interaction.followup.send(
+                    embed=error_embed("Chưa gửi được thẻ do lỗi kết nối, hệ thống sẽ tự gửi lại và thông báo kết quả tại kênh này."),
+                    ephemeral=True,
+                )
+                logger.warning(f"[COG: NAP_THE_CAO] Gửi thẻ lỗi, hẹn gửi lại: #{submission.request_id} - {result.message}")
                 return
-            if response["status"] != 99 and response["status"] != 1 and response["status"] != 2:
-                await interaction.followup.send(embed=error_embed(f"{response['message']} (mã lỗi: {response['status']})"), ephemeral=True)
-                logger.error(f"[COG: NAP_THE_CAO] Kết quả API: {response}")
+            if result.outcome == REJECTED:
+                await self.submission_outbox.mark_rejected(submission, result)
+                await interaction.followup.send(embed=error_embed(result.message), ephemeral=True)
+                logger.error(f"[COG: NAP_THE_CAO] Kết quả API: {result.response}")
                 return
 
             # Xuất thông tin và lấy message ID
-            followup_message = await interaction.followup.send(embed=self._embed_waiting_for_processing(telco, amount, code, serial, response["trans_id"]))
+            response = result.response
+            followup_message = await interaction.followup.send(embed=waiting_embed(telco, amount, serial, response["trans_id"]))
 
-            # Cập nhật message ID vào database
-            history_exchange_card = HistoryExchangeCard(
-                telco=telco,
-                value=amount,
-                code=code,
-                serial=serial,
-                user_discord_id=str(interaction.user.id),
+            # Lưu thẻ vào lịch sử và đánh dấu yêu cầu đã gửi xong
+            history_exchange_card = await self.submission_outbox.mark_accepted(
+                submission,
+                response,
                 message_discord_id=str(followup_message.id),
-                channel_discord_id=str(interaction.channel.id),
                 server=get_config_value("provider", "https://card2k.com"),
-                request_id=response["request_id"],
-                transaction_id=response["trans_id"],
-                status="pending",
             )
-            self.session.add(history_exchange_card)
-            self.session.commit()
             logger.info(f"[COG: NAP_THE_CAO] Lưu thông tin vào database: {history_exchange_card}")
 
+            # Báo cho task kiểm tra trạng thái để kiểm tra thẻ mới sớm
+            nap_the_cao_task = self.bot.get_cog("NapTheCaoTask")
+            if nap_the_cao_task is not None:
+                nap_the_cao_task.schedule_check(history_exchange_card.next_check_at)
+
         except Exception as e:
             logger.error(f"[COG: NAP_THE_CAO] Lỗi: {e}")
-            self.session.rollback()
             return
 
 class ConfirmationView(discord.ui.View):
@@ -270,7 +200,7 @@ class ConfirmationView(discord.ui.View):
         for item in self.children:
             item.disabled = True
 
-        await interaction.response.edit_message(embed=self.cog._embed_confirm_nap_the_cao(self.telco, self.amount, self.code, self.serial), view=self)
+        await interaction.response.edit_message(embed=confirm_embed(self.telco, self.amount, self.code, self.serial), view=self)
         
         # Gọi API xử lý thẻ cào
         await self.cog.process_card_exchange(interaction, self.telco, self.amount, self.code, self.serial)
@@ -1,3 +1,5 @@
+import math
+
 import discord
 
 from discord import app_commands
@@ -24,6 +26,17 @@ class Ping(commands.Cog):
                 description=f"Ping của bot là `{ping:.2f}ms`",
                 color=EmbedColor.INFO,
             )
+
+            # Chế độ nhiều shard: hiện ping của từng shard, đánh dấu shard đang phục vụ server này
+            latencies = getattr(self.bot, "latencies", None)
+            if latencies and self.bot.shard_count:
+                current_shard_id = interaction.guild.shard_id if interaction.guild else 0
+                embed.description = f"Ping trung bình của bot là `{ping:.2f}ms` ({len(latencies)}/{self.bot.shard_count} shard)"
+                for shard_id, latency in latencies[:25]:
+                    marker = " (server này)" if shard_id == current_shard_id else ""
+                    value = f"`{latency * 1000:.2f}ms`" if math.isfinite(latency) else "Chưa kết nối"
+                    embed.add_field(name=f"Shard {shard_id}{marker}", value=value, inline=True)
+
             await interaction.response.send_message(embed=embed)
         except Exception as e:
             logger.error(f"[COG: PING] Lỗi: {e}")
@@ -0,0 +1,65 @@
+import datetime
+import os
+import socket
+import uuid
+from typing import List, Optional, Sequence
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def new_lease_owner() -> str:
+    """
+    Tên định danh của process đang nhận việc (host:pid:ngẫu nhiên), khác nhau giữa các bot/worker
+    """
+
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def lease_available(model, now: datetime.datetime):
+    """
+    Điều kiện dòng chưa có ai nhận hoặc lease đã hết hạn (process nhận trước đó đã dừng)
+    """
+
+    return or_(model.lease_owner.is_(None), model.lease_expires_at <= now)
+
+
+async def claim(
+    session: AsyncSession,
+    model,
+    criteria: Sequence,
+    order_by,
+    limit: int,
+    owner: str,
+    duration: float,
+    now: Optional[datetime.datetime] = None,
+) -> List:
+    """
+    Nhận tối đa limit dòng thỏa criteria cho owner trong duration giây
+
+    Các dòng đang được process khác giữ (lease chưa hết hạn) bị bỏ qua. Lệnh UPDATE chỉ ghi đè
+    dòng còn trống nên khi nhiều process nhận cùng lúc, mỗi dòng chỉ thuộc về một process.
+    PostgreSQL, MySQL: bỏ qua luôn các dòng đang bị khóa (SKIP LOCKED) thay vì chờ.
+    """
+
+    now = now or datetime.datetime.utcnow()
+    ids = (await session.scalars(
+        select(model.id)
+        .where(*criteria, lease_available(model, now))
+        .order_by(order_by)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )).all()
+    if not ids:
+        return []
+
+    await session.execute(
+        update(model)
+        .where(model.id.in_(ids), lease_available(model, now))
+        .values(lease_owner=owner, lease_expires_at=now + datetime.timedelta(seconds=duration))
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.scalars(
+        select(model).where(model.id.in_(ids), model.lease_owner == owner).order_by(order_by)
+    )
+    return list(result.all())
@@ -0,0 +1,140 @@
+import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func, insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn
+
+from database.base import Base
+from helpers.console import logger
+
+# Bảng lưu các phiên bản migration đã chạy
+_migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.datetime.utcnow),
+)
+
+
+def _history_table() -> Table:
+    return Base.metadata.tables["history_exchange_cards"]
+
+
+def _create_indexes(connection: Connection, indexes: List[Index]) -> None:
+    """
+    Tạo index nếu chưa tồn tại
+    """
+
+    for index in indexes:
+        index.create(bind=connection, checkfirst=True)
+
+
+def _add_columns(connection: Connection, table: Table, column_names: List[str]) -> None:
+    """
+    Thêm cột vào bảng đã tồn tại nếu chưa có
+    """
+
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    for column_name in column_names:
+        if column_name in existing:
+            continue
+        column_ddl = CreateColumn(table.c[column_name]).compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+
+def _ensure_no_duplicates(connection: Connection, table: Table, column_name: str) -> None:
+    """
+    Kiểm tra cột không có giá trị trùng trước khi tạo unique index
+    """
+
+    column = table.c[column_name]
+    duplicated = connection.execute(
+        select(column, func.count())
+        .where(column.is_not(None))
+        .group_by(column)
+        .having(func.count() > 1)
+        .limit(5)
+    ).all()
+    if duplicated:
+        values = ", ".join(str(row[0]) for row in duplicated)
+        raise RuntimeError(f"Không thể tạo unique index cho {table.name}.{column_name}, giá trị bị trùng: {values}")
+
+
+def _v1_history_exchange_card_indexes(connection: Connection) -> None:
+    table = _history_table()
+    _ensure_no_duplicates(connection, table, "request_id")
+    _ensure_no_duplicates(connection, table, "transaction_id")
+    _create_indexes(connection, [
+        Index("ix_history_exchange_cards_status_created_at", table.c.status, table.c.created_at),
+        Index("ux_history_exchange_cards_request_id", table.c.request_id, unique=True),
+        Index("ux_history_exchange_cards_transaction_id", table.c.transaction_id, unique=True),
+        Index("ix_history_exchange_cards_user_discord_id", table.c.user_discord_id),
+    ])
+
+
+def _v2_history_exchange_card_poll_schedule(connection: Connection) -> None:
+    table = _history_table()
+    _add_columns(connection, table, ["next_check_at", "check_attempts"])
+    _create_indexes(connection, [
+        Index("ix_history_exchange_cards_status_next_check_at", table.c.status, table.c.next_check_at),
+    ])
+
+
+def _v3_card_submissions(connection: Connection) -> None:
+    Base.metadata.tables["card_submissions"].create(bind=connection, checkfirst=True)
+
+
+def _v4_discord_updates(connection: Connection) -> None:
+    Base.metadata.tables["discord_updates"].create(bind=connection, checkfirst=True)
+
+
+def _v5_leases(connection: Connection) -> None:
+    _add_columns(connection, _history_table(), ["lease_owner", "lease_expires_at"])
+    _add_columns(connection, Base.metadata.tables["discord_updates"], ["lease_owner", "lease_expires_at"])
+    _add_columns(connection, Base.metadata.tables["card_submissions"], ["lease_owner", "lease_expires_at"])
+
+
+# Danh sách migration theo thứ tự: (version, mô tả, hàm thực thi)
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Thêm index cho history_exchange_cards", _v1_history_exchange_card_indexes),
+    (2, "Thêm lịch kiểm tra trạng thái cho history_exchange_cards", _v2_history_exchange_card_poll_schedule),
+    (3, "Thêm bảng card_submissions (outbox gửi thẻ)", _v3_card_submissions),
+    (4, "Thêm bảng discord_updates (hàng đợi cập nhật Discord từ worker)", _v4_discord_updates),
+    (5, "Thêm lease cho history_exchange_cards, discord_updates và card_submissions (nhiều bot/worker)", _v5_leases),
+]
+
+
+def get_current_version(connection: Connection) -> int:
+    """
+    Lấy phiên bản migration hiện tại của database
+    """
+
+    return connection.execute(select(func.coalesce(func.max(schema_migrations.c.version), 0))).scalar_one()
+
+
+def run_migrations(engine: Engine) -> int:
+    """
+    Chạy các migration chưa được áp dụng, mỗi migration trong một transaction
+
+    Trả về phiên bản hiện tại sau khi chạy
+    """
+
+    _migration_metadata.create_all(bind=engine)
+
+    with engine.connect() as connection:
+        current_version = get_current_version(connection)
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        with engine.begin() as connection:
+            logger.info(f"[DATABASE] Chạy migration v{version}: {description}")
+            migrate(connection)
+            connection.execute(insert(schema_migrations).values(version=version, description=description))
+        current_version = version
+
+    return current_version
@@ -1 +1,3 @@
-from .history_exchange_card import HistoryExchangeCard
\ No newline at end of file
+from .history_exchange_card import HistoryExchangeCard
+from .card_submission import CardSubmission
+from .discord_update import DiscordUpdate
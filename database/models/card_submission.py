@@ -0,0 +1,47 @@
+from sqlalchemy import String, DateTime, Enum, Integer, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from database.base import Base
+import datetime
+
+
+class CardSubmission(Base):
+    """
+    Yêu cầu gửi thẻ (outbox): được lưu trước khi gọi nhà cung cấp để không mất thẻ khi bot dừng hoặc lỗi mạng
+    """
+
+    __tablename__ = "card_submissions"
+    __table_args__ = (
+        Index("ux_card_submissions_request_id", "request_id", unique=True),
+        Index("ix_card_submissions_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Người dùng khai báo
+    telco: Mapped[str] = mapped_column(String(255), nullable=False)
+    value: Mapped[int] = mapped_column(Integer, default=0)
+    code: Mapped[str] = mapped_column(String(255), nullable=False)
+    serial: Mapped[str] = mapped_column(String(255), nullable=False)
+    user_discord_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    channel_discord_id: Mapped[str] = mapped_column(String(255), nullable=True)
+    # Hệ thống xử lý
+    request_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    status: Mapped[str] = mapped_column(
+        Enum("pending", "delivered", "rejected", "failed", name="card_submission_status"),
+        nullable=False,
+        default="pending",
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[str] = mapped_column(String(255), nullable=True)
+    # Bot đang gửi lại yêu cầu và thời điểm hết hạn (bot khác nhận lại khi hết hạn)
+    lease_owner: Mapped[str] = mapped_column(String(255), nullable=True)
+    lease_expires_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.datetime.utcnow
+    )
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime,
+        nullable=False,
+        default=datetime.datetime.utcnow,
+        onupdate=datetime.datetime.utcnow,
+    )
@@ -0,0 +1,27 @@
+from sqlalchemy import String, DateTime, Integer, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from database.base import Base
+import datetime
+
+
+class DiscordUpdate(Base):
+    """
+    Cập nhật Discord đang chờ bot gửi (worker kiểm tra thẻ chạy riêng không kết nối Discord)
+    """
+
+    __tablename__ = "discord_updates"
+    __table_args__ = (
+        Index("ix_discord_updates_history_exchange_card_id", "history_exchange_card_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    history_exchange_card_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Trạng thái mới của thẻ (success, wrong_amount, failed) và lý do lỗi nếu có
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    error_message: Mapped[str] = mapped_column(String(255), nullable=True)
+    # Bot đang gửi cập nhật và thời điểm hết hạn (bot khác nhận lại khi hết hạn)
+    lease_owner: Mapped[str] = mapped_column(String(255), nullable=True)
+    lease_expires_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.datetime.utcnow
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, String, DateTime, ForeignKey, Enum, Integer
+from sqlalchemy import BigInteger, String, DateTime, ForeignKey, Enum, Integer, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship, declarative_base
 from database.base import Base
 import datetime
@@ -6,6 +6,13 @@ import datetime
 
 class HistoryExchangeCard(Base):
     __tablename__ = "history_exchange_cards"
+    __table_args__ = (
+        Index("ix_history_exchange_cards_status_created_at", "status", "created_at"),
+        Index("ux_history_exchange_cards_request_id", "request_id", unique=True),
+        Index("ux_history_exchange_cards_transaction_id", "transaction_id", unique=True),
+        Index("ix_history_exchange_cards_user_discord_id", "user_discord_id"),
+        Index("ix_history_exchange_cards_status_next_check_at", "status", "next_check_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     # Người dùng khai báo
@@ -26,6 +33,12 @@ class HistoryExchangeCard(Base):
         nullable=False,
         default="pending",
     )
+    # Lịch kiểm tra trạng thái thẻ
+    next_check_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=True)
+    check_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Bot/worker đang kiểm tra thẻ và thời điểm hết hạn (process khác nhận lại khi hết hạn)
+    lease_owner: Mapped[str] = mapped_column(String(255), nullable=True)
+    lease_expires_at: Mapped[datetime.datetime] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime.datetime] = mapped_column(
         DateTime, nullable=False, default=datetime.datetime.utcnow
     )
@@ -1,5 +1,117 @@
-from sqlalchemy import create_engine
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-engine = create_engine("sqlite:///database.db", connect_args={"check_same_thread": False})
+from helpers.metrics import db_commit_seconds
+from utils.config import get_config_value
+from utils.env import get_env
+
+DEFAULT_DATABASE_URL = "sqlite:///database.db"
+
+# Driver bất đồng bộ tương ứng với từng loại database
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def get_database_url() -> str:
+    """
+    Lấy URL database từ biến môi trường DATABASE_URL (mặc định SQLite)
+    """
+
+    return get_env("DATABASE_URL") or DEFAULT_DATABASE_URL
+
+
+def to_async_url(url: str) -> str:
+    """
+    Chuyển URL database sang driver bất đồng bộ (vd: sqlite:// -> sqlite+aiosqlite://)
+    """
+
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise ValueError(f"Không hỗ trợ database: {backend}")
+    return parsed.set(drivername=_ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def _register_sqlite_pragmas(engine: Engine, pragmas: dict) -> None:
+    """
+    Thiết lập PRAGMA cho mỗi kết nối SQLite mới
+    """
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_engines(url: str, options: Optional[dict] = None) -> Tuple[Engine, AsyncEngine]:
+    """
+    Tạo engine đồng bộ và bất đồng bộ theo cấu hình database
+
+    options (mục database trong settings.yml):
+        - pool_size, max_overflow, pool_recycle, pool_timeout: cấu hình connection pool
+        - sqlite: các PRAGMA cho SQLite (journal_mode, synchronous, busy_timeout, cache_size, ...)
+    """
+
+    options = options or {}
+    parsed = make_url(url)
+    is_sqlite = parsed.get_backend_name() == "sqlite"
+    is_memory = is_sqlite and parsed.database in (None, "", ":memory:")
+
+    engine_kwargs = {"pool_pre_ping": not is_sqlite}
+    if not is_memory:
+        engine_kwargs.update(
+            pool_size=int(options.get("pool_size", 5)),
+            max_overflow=int(options.get("max_overflow", 10)),
+            pool_timeout=float(options.get("pool_timeout", 30)),
+            pool_recycle=int(options.get("pool_recycle", 1800)),
+        )
+
+    sync_kwargs = dict(engine_kwargs)
+    async_kwargs = dict(engine_kwargs)
+    pragmas = {}
+    if is_sqlite:
+        pragmas = {name: value for name, value in dict(options.get("sqlite", {}) or {}).items() if value is not None}
+        busy_timeout = float(pragmas.get("busy_timeout", 5000)) / 1000
+        sync_kwargs["connect_args"] = {"check_same_thread": False, "timeout": busy_timeout}
+        async_kwargs["connect_args"] = {"timeout": busy_timeout}
+
+    sync_engine = create_engine(url, **sync_kwargs)
+    async_engine = create_async_engine(to_async_url(url), **async_kwargs)
+    if pragmas:
+        _register_sqlite_pragmas(sync_engine, pragmas)
+        _register_sqlite_pragmas(async_engine.sync_engine, pragmas)
+
+    return sync_engine, async_engine
+
+
+# Engine đồng bộ: dùng cho tạo bảng và migration lúc khởi động
+# Engine bất đồng bộ: dùng cho cogs và tasks, không chặn event loop
+engine, async_engine = create_engines(get_database_url(), get_config_value("database", {}))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """
+    Mở session cho một đơn vị công việc: commit khi thành công, rollback khi có lỗi
+    """
+
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+            with db_commit_seconds.time():
+                await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
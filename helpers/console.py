@@ -1,12 +1,18 @@
 import os
 import sys
+import time
+import queue
+import atexit
 import logging
+import threading
 import traceback
 from datetime import datetime
 from typing import Optional, Dict, Any, Union
 from pathlib import Path
 from enum import Enum
 
+from utils.config import get_config_value
+
 class LogLevel(Enum):
     """Log levels với colors"""
     DEBUG = ("DEBUG", "\033[36m", "🐛")      # Cyan
@@ -23,7 +29,9 @@ class ConsoleLogger:
                  name: str = "Bot",
                  log_file: Optional[str] = None,
                  enable_colors: bool = True,
-                 enable_file_logging: bool = True):
+                 enable_file_logging: bool = True,
+                 async_mode: bool = False,
+                 queue_size: int = 10000):
         self.name = name
         self.enable_colors = enable_colors and self._supports_color()
         self.enable_file_logging = enable_file_logging
@@ -41,6 +49,14 @@ class ConsoleLogger:
             "critical": 0,
             "success": 0
         }
+        
+        # Queue mode: hot path chỉ đưa record vào queue, thread nền xử lý format và ghi file
+        self.async_mode = async_mode
+        self._dropped = 0
+        self._queue: Optional[queue.Queue] = None
+        self._worker: Optional[threading.Thread] = None
+        if async_mode:
+            self._start_worker(queue_size)
     
     def _supports_color(self) -> bool:
         """Check if terminal supports colors"""
@@ -86,10 +102,52 @@ class ConsoleLogger:
         """Get formatted timestamp"""
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    def _get_caller_info(self) -> str:
+    def _start_worker(self, queue_size: int) -> None:
+        """Start background thread for queue mode"""
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = threading.Thread(target=self._process_queue, name=f"{self.name}_logger", daemon=True)
+        self._worker.start()
+        atexit.register(self.shutdown)
+    
+    def _process_queue(self) -> None:
+        """Background thread: format, resolve caller and write log records"""
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    return
+                level, message, extra_data, caller, exc_info, created = record
+                caller_info = None
+                if caller is not None:
+                    code, line_number = caller
+                    caller_info = f"{os.path.basename(code.co_filename)}:{code.co_name}:{line_number}"
+                timestamp = datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S")
+                self._emit(level, message, extra_data, caller_info, exc_info, timestamp)
+            except Exception:
+                pass
+            finally:
+                self._queue.task_done()
+    
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait until queued records are written"""
+        if self._queue is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+    
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Flush queued records and stop background thread"""
+        if self._worker is None or not self._worker.is_alive():
+            return
+        self.flush(timeout)
+        self._queue.put(None)
+        self._worker.join(timeout)
+    
+    def _get_caller_info(self, depth: int = 3) -> str:
         """Get caller file and line info"""
         try:
-            frame = sys._getframe(3)  # Skip log wrapper functions
+            frame = sys._getframe(depth)  # Skip log wrapper functions
             filename = os.path.basename(frame.f_code.co_filename)
             line_number = frame.f_lineno
             function_name = frame.f_code.co_name
@@ -101,9 +159,10 @@ class ConsoleLogger:
                        level: LogLevel, 
                        message: str,
                        extra_data: Optional[Dict[str, Any]] = None,
-                       show_caller: bool = False) -> str:
+                       caller: Optional[str] = None,
+                       timestamp: Optional[str] = None) -> str:
         """Format log message"""
-        timestamp = self._get_timestamp()
+        timestamp = timestamp or self._get_timestamp()
         level_name, color, emoji = level.value
         
         # Base format
@@ -113,8 +172,7 @@ class ConsoleLogger:
             formatted = f"[{timestamp}] {level_name:<8} | {self.name} | {message}"
         
         # Add caller info if requested
-        if show_caller:
-            caller = self._get_caller_info()
+        if caller:
             formatted += f" | {caller}"
         
         # Add extra data
@@ -132,8 +190,39 @@ class ConsoleLogger:
              exc_info: bool = False) -> None:
         """Internal logging method"""
         
+        # Update stats
+        self.stats[level.name.lower()] += 1
+        
+        if self._queue is None:
+            caller = self._get_caller_info() if show_caller else None
+            self._emit(level, message, extra_data, caller, exc_info)
+            return
+        
+        # Queue mode: chỉ lấy code object + dòng của caller và exc_info hiện tại, phần còn lại để thread nền xử lý
+        caller = None
+        if show_caller:
+            try:
+                frame = sys._getframe(2)
+                caller = (frame.f_code, frame.f_lineno)
+            except ValueError:
+                pass
+        record = (level, message, extra_data, caller, sys.exc_info() if exc_info else None, time.time())
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._dropped += 1
+    
+    def _emit(self,
+              level: LogLevel,
+              message: str,
+              extra_data: Optional[Dict[str, Any]] = None,
+              caller: Optional[str] = None,
+              exc_info: Any = False,
+              timestamp: Optional[str] = None) -> None:
+        """Format and write a log record to console and file"""
+        
         # Format message
-        formatted_message = self._format_message(level, message, extra_data, show_caller)
+        formatted_message = self._format_message(level, message, extra_data, caller, timestamp)
         
         # Print to console
         print(formatted_message)
@@ -157,10 +246,10 @@ class ConsoleLogger:
             }
             
             file_level = level_mapping.get(level.value[0], logging.INFO)
+            # exc_info=(None, None, None) nghĩa là không có exception
+            if isinstance(exc_info, tuple) and exc_info[0] is None:
+                exc_info = False
             self.file_logger.log(file_level, clean_message, exc_info=exc_info)
-        
-        # Update stats
-        self.stats[level.name.lower()] += 1
     
     def debug(self, message: str, **kwargs) -> None:
         """Log debug message"""
@@ -243,7 +332,10 @@ class ConsoleLogger:
     
     def get_stats(self) -> Dict[str, int]:
         """Get logging statistics"""
-        return self.stats.copy()
+        stats = self.stats.copy()
+        stats["queued"] = self._queue.qsize() if self._queue is not None else 0
+        stats["dropped"] = self._dropped
+        return stats
     
     def print_stats(self) -> None:
         """Print logging statistics"""
@@ -260,7 +352,10 @@ class ConsoleLogger:
         self.table(stats_data[0], stats_data[1:])
 
 # Global logger instance
-logger = ConsoleLogger()
+logger = ConsoleLogger(
+    async_mode=bool(get_config_value("logging.async_mode", False)),
+    queue_size=int(get_config_value("logging.queue_size", 10000)),
+)
 
 # Convenience functions
 def debug(message: str, **kwargs) -> None:
@@ -1,33 +1,134 @@
 import asyncio
+import contextlib
 import os
 import shutil
 
 import discord
 from discord.ext import commands
 
+from api.card2k.exchange_card import ExchangeCard as ExchangeCardAPI
 from constants import get_bot_info, print_bot_info_panel_no_color
 from database.models import HistoryExchangeCard
 from database.base import Base
-from database.session import engine
+from database.migrations import run_migrations
+from database.session import async_engine, engine
 from helpers.console import LogContext, logger
-from utils.config import get_config_value
+from helpers.metrics import MetricsServer, interaction_response_seconds, metrics
+from services.discord.notification_dispatcher import NotificationDispatcher
+from utils.config import ConfigWatcher, get_config_value
 from utils.env import get_env
 
 
-class CardSwapBot(commands.Bot):
+# Chế độ nhiều shard (chỉ đọc khi khởi động, đổi cấu hình cần khởi động lại bot)
+SHARDING_ENABLED = bool(get_config_value("sharding.enabled", False))
+
+
+def _sharding_options() -> dict:
+    """
+    Tham số shard cho AutoShardedBot (để trống thì Discord tự chọn số shard)
+    """
+    options = {}
+    shard_count = int(get_config_value("sharding.shard_count", 0) or 0)
+    shard_ids = [int(shard_id) for shard_id in get_config_value("sharding.shard_ids", []) or []]
+    if shard_count > 0:
+        options["shard_count"] = shard_count
+        # Chỉ chọn shard khi biết tổng số shard (discord.py yêu cầu cả hai)
+        if shard_ids:
+            options["shard_ids"] = shard_ids
+    return options
+
+
+def _command_guild_ids() -> list:
+    """
+    Danh sách server đăng ký lệnh slash khi command_sync.mode là "guild"
+    """
+    guild_ids = get_config_value("command_sync.guild_ids", []) or []
+    if not guild_ids and get_env("GUILD_ID"):
+        guild_ids = [get_env("GUILD_ID")]
+    return [int(guild_id) for guild_id in guild_ids]
+
+
+class CardSwapBot(commands.AutoShardedBot if SHARDING_ENABLED else commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
         PREFIX = get_config_value("prefix")
-        super().__init__(command_prefix=PREFIX, intents=intents, help_command=None)
+        options = _sharding_options() if SHARDING_ENABLED else {}
+        super().__init__(command_prefix=PREFIX, intents=intents, help_command=None, **options)
+        # Client card2k dùng chung cho tất cả cogs và tasks (khởi tạo trong setup_hook)
+        self.card2k_api: ExchangeCardAPI = None
+        # Gom thông báo kết quả nạp thẻ gửi vào kênh thông báo
+        self.notification_dispatcher = NotificationDispatcher(
+            self,
+            window=float(get_config_value("notifications.batch_window", 1.0)),
+            max_embeds=int(get_config_value("notifications.max_embeds_per_message", 10)),
+        )
+        # Tự tải lại configs/settings.yml khi file thay đổi
+        self.config_watcher: ConfigWatcher = None
+        # HTTP endpoint xuất metrics (bật trong settings.yml)
+        self.metrics_server: MetricsServer = None
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        # Thời gian từ lúc Discord tạo interaction đến khi lệnh xử lý xong
+        elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        interaction_response_seconds.observe(elapsed, command=command.qualified_name)
 
     async def on_ready(self):
         logger.success(print_bot_info_panel_no_color(get_bot_info(), "Bot đã sẵn sàng!"))
 
     async def setup_hook(self):
         with LogContext("Bot Setup"):
+            self.card2k_api = ExchangeCardAPI()
+            if get_config_value("config_watcher.enabled", True):
+                self.config_watcher = ConfigWatcher(interval=float(get_config_value("config_watcher.interval", 2)))
+                self.config_watcher.start()
+            if get_config_value("metrics.enabled", False):
+                await self._start_metrics_server()
             await self._load_extensions()
             await self._sync_commands()
 
+    async def _start_metrics_server(self):
+        """
+        Khởi động endpoint metrics và gắn các chỉ số của client card2k
+        """
+        queue_depth = metrics.gauge("card2k_rate_limit_queued", "Số request card2k đang chờ rate limiter", ["priority"])
+        wait_p99 = metrics.gauge("card2k_rate_limit_wait_p99_seconds", "Thời gian chờ rate limiter (p99)", ["priority"])
+        for priority in ("submit", "check", "background"):
+            queue_depth.set_function(lambda p=priority: self.card2k_api.get_rate_limit_stats()["priorities"][p]["queued"], priority=priority)
+            wait_p99.set_function(lambda p=priority: self.card2k_api.get_rate_limit_stats()["priorities"][p]["wait_p99"], priority=priority)
+        metrics.gauge("card2k_circuit_open", "Nhà cung cấp đang tạm ngắt (1) hay không (0)").set_function(
+            lambda: 0 if self.card2k_api.circuit_breaker.is_closed else 1
+        )
+        metrics.gauge("notifications_queued", "Số thông báo đang chờ gửi").set_function(
+            lambda: self.notification_dispatcher.get_stats()["queued"]
+        )
+
+        self.metrics_server = MetricsServer(
+            metrics,
+            host=get_config_value("metrics.host", "127.0.0.1"),
+            port=int(get_config_value("metrics.port", 9100)),
+            path=get_config_value("metrics.path", "/metrics"),
+        )
+        try:
+            await self.metrics_server.start()
+        except OSError as e:
+            logger.error(f"[METRICS] Không thể khởi động endpoint metrics: {e}")
+            self.metrics_server = None
+
+    async def close(self):
+        # Gỡ cogs trước (dừng các task, chờ task làm mới phí kết thúc) rồi mới đóng HTTP client và database
+        for extension in tuple(self.extensions):
+            with contextlib.suppress(Exception):
+                await self.unload_extension(extension)
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await self.notification_dispatcher.close()
+        if self.config_watcher is not None:
+            await self.config_watcher.stop()
+        if self.card2k_api is not None:
+            await self.card2k_api.close()
+        await async_engine.dispose()
+        await super().close()
+
     async def _load_extensions(self):
         extensions = [("./cogs", "cogs"), ("./tasks", "tasks")]
 
@@ -47,23 +148,37 @@ class CardSwapBot(commands.Bot):
 
     async def _sync_commands(self):
         """
-        Tải các lệnh slash
+        Tải các lệnh slash (toàn cục hoặc cho từng server trong command_sync.guild_ids)
         """
-        try:
-            guild = discord.Object(id=get_env("GUILD_ID"))
-            self.tree.copy_global_to(guild=guild)
-            await self.tree.sync(guild=guild)
-        except Exception as e:
-            print(f"[ERROR] Lỗi khi sync lệnh slash: {e}")
+        if get_config_value("command_sync.mode", "guild") == "global":
+            try:
+                synced = await self.tree.sync()
+                logger.info(f"Đã đồng bộ {len(synced)} lệnh slash toàn cục")
+            except Exception as e:
+                print(f"[ERROR] Lỗi khi sync lệnh slash: {e}")
+            return
+
+        for guild_id in _command_guild_ids():
+            try:
+                guild = discord.Object(id=guild_id)
+                self.tree.copy_global_to(guild=guild)
+                await self.tree.sync(guild=guild)
+                logger.info(f"Đã đồng bộ lệnh slash cho server {guild_id}")
+            except Exception as e:
+                print(f"[ERROR] Lỗi khi sync lệnh slash cho server {guild_id}: {e}")
 
 
 bot = CardSwapBot()
 
 
 async def main():
-    required_env = ["DISCORD_TOKEN", "GUILD_ID", "PARTNER_ID", "PARTNER_KEY"]
+    required_env = ["DISCORD_TOKEN", "PARTNER_ID", "PARTNER_KEY"]
     missing_env = [env for env in required_env if not get_env(env)]
 
+    # Chế độ đăng ký lệnh theo server cần ít nhất một server (GUILD_ID hoặc command_sync.guild_ids)
+    if get_config_value("command_sync.mode", "guild") != "global" and not _command_guild_ids():
+        missing_env.append("GUILD_ID")
+
     # Kiểm tra file .env có tồn tại
     if not os.path.exists(".env"):
         shutil.copy(".env.example", ".env")
@@ -84,8 +199,12 @@ async def main():
 if __name__ == "__main__":
     try:
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
         asyncio.run(main())
     except KeyboardInterrupt:
         print(f"[INFO] Bot đã dừng theo yêu cầu")
     except Exception as e:
         print(f"[ERROR] Lỗi khi chạy bot: {e}")
+    finally:
+        # Ghi hết log còn trong queue trước khi thoát
+        logger.shutdown()
@@ -0,0 +1,337 @@
+import asyncio
+import datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy import case, func, or_, select, update
+
+from database.leases import claim, new_lease_owner
+from database.models import HistoryExchangeCard
+from database.session import session_scope
+from helpers.console import logger
+from helpers.metrics import pending_cards
+from services.card2k.poll_schedule import PollSchedule
+from services.discord.update_queue import DiscordUpdateQueue
+from utils.config import get_config_value
+
+# (thẻ, trạng thái mới, lý do lỗi) của thẻ vừa có kết quả cuối cùng
+Transition = Tuple[HistoryExchangeCard, str, Optional[str]]
+
+
+class CardPoller:
+    """
+    Engine kiểm tra trạng thái các thẻ đang chờ: lấy thẻ đến hạn, gọi API card2k, lưu kết quả
+
+    Dùng chung cho NapTheCaoTask (chạy trong bot) và worker.py (process riêng, không kết nối Discord).
+    publish_updates=True: ghi cập nhật Discord vào hàng đợi (DiscordUpdateQueue) cùng transaction
+    với kết quả thẻ để bot gửi sau, thay vì trả về cho nơi gọi tự gửi.
+
+    Nhiều bot/worker có thể chạy trên cùng database: thẻ được nhận theo lô (claim_batch_size thẻ)
+    bằng lease ghi trên từng dòng (lease_owner, lease_expires_at). Thẻ đang được process khác giữ bị
+    bỏ qua, lease của process đã dừng được nhận lại sau lease_duration giây.
+    """
+
+    def __init__(
+        self,
+        api,
+        schedule: Optional[PollSchedule] = None,
+        concurrency: Optional[int] = None,
+        publish_updates: bool = False,
+        owner: Optional[str] = None,
+    ):
+        self.api = api
+        self.schedule = schedule or PollSchedule.from_config()
+        self.publish_updates = publish_updates
+        self.owner = owner or new_lease_owner()
+
+        config = get_config_value("card_status_check", {}) or {}
+        # Số thẻ được kiểm tra đồng thời trong mỗi chu kỳ
+        if concurrency is None:
+            concurrency = config.get("concurrency", 10)
+        self.concurrency = max(1, int(concurrency))
+        self._check_semaphore = asyncio.Semaphore(self.concurrency)
+        self.claim_batch_size = max(1, int(config.get("claim_batch_size", 500)))
+        self.lease_duration = max(1.0, float(config.get("lease_duration", 120)))
+
+    async def poll_due(
+        self, on_committed: Optional[Callable[[List[Transition]], Awaitable[None]]] = None
+    ) -> Optional[Tuple[int, List[Transition]]]:
+        """
+        Nhận và kiểm tra các thẻ đã đến hạn theo từng lô (claim_batch_size thẻ)
+
+        Mỗi lô dùng hai transaction: nhận lease (claim_due) và lưu kết quả bằng một lệnh bulk update
+        (commit_cards), nên một chu kỳ có nhiều thẻ đến hạn sẽ commit nhiều lần, không phải một lần.
+        on_committed(transitions) được gọi sau khi mỗi lô lưu thành công.
+        Trả về (số thẻ đã kiểm tra, các thẻ vừa có kết quả), None nếu lưu kết quả thất bại
+        """
+
+        checked = 0
+        all_transitions = []
+        while True:
+            cards = await self.claim_due()
+            if not cards:
+                break
+
+            # Kiểm tra đồng thời các thẻ (giới hạn bởi concurrency), gom kết quả theo thứ tự hoàn thành
+            started_at = datetime.datetime.utcnow()
+            transitions = []
+            for completed in asyncio.as_completed([self._check_card(card) for card in cards]):
+                card, response = await completed
+                transition = self.apply_check_result(card, response)
+                if transition is not None:
+                    transitions.append((card, *transition))
+
+            elapsed = (datetime.datetime.utcnow() - started_at).total_seconds()
+            if elapsed > self.lease_duration:
+                logger.warning(
+                    f"[POLLER] Kiểm tra {len(cards)} thẻ mất {elapsed:.0f}s, vượt lease_duration ({self.lease_duration:.0f}s): "
+                    f"nên giảm claim_batch_size hoặc tăng lease_duration"
+                )
+
+            # Lưu toàn bộ thay đổi của lô trong một transaction, chỉ cập nhật Discord khi đã lưu thành công
+            try:
+                transitions = await self.commit_cards(cards, transitions, leased=True)
+            except Exception as e:
+                logger.error(f"[POLLER] Lỗi khi lưu kết quả kiểm tra {len(cards)} thẻ: {e}")
+                return None
+
+            checked += len(cards)
+            all_transitions.extend(transitions)
+            if on_committed is not None and transitions:
+                await on_committed(transitions)
+            if len(cards) < self.claim_batch_size:
+                break
+
+        return checked, all_transitions
+
+    async def claim_due(self) -> List[HistoryExchangeCard]:
+        """
+        Nhận một lô thẻ đã đến hạn kiểm tra (bỏ qua thẻ đang được bot/worker khác kiểm tra)
+        """
+
+        now = datetime.datetime.utcnow()
+        async with session_scope() as session:
+            return await claim(
+                session,
+                HistoryExchangeCard,
+                [
+                    HistoryExchangeCard.status == "pending",
+                    or_(HistoryExchangeCard.next_check_at.is_(None), HistoryExchangeCard.next_check_at <= now),
+                ],
+                order_by=HistoryExchangeCard.next_check_at,
+                limit=self.claim_batch_size,
+                owner=self.owner,
+                duration=self.lease_duration,
+                now=now,
+            )
+
+    async def next_due(self) -> Tuple[Optional[datetime.datetime], int]:
+        """
+        Thời điểm đến hạn sớm nhất (UTC) và số thẻ đang chờ
+
+        Thẻ đang được process khác giữ được tính đến hạn khi lease hết hạn
+        """
+
+        now = datetime.datetime.utcnow()
+        due_at = case(
+            (HistoryExchangeCard.lease_expires_at > now, HistoryExchangeCard.lease_expires_at),
+            else_=HistoryExchangeCard.next_check_at,
+        )
+        async with session_scope() as session:
+            earliest, pending_count = (await session.execute(
+                select(func.min(due_at), func.count()).where(HistoryExchangeCard.status == "pending")
+            )).one()
+        pending_cards.set(pending_count)
+        return earliest, pending_count
+
+    async def handle_callback(self, payload: dict) -> Optional[List[Transition]]:
+        """
+        Xử lý callback trạng thái thẻ từ nhà cung cấp
+
+        Trả về None nếu không tìm thấy thẻ theo request_id, ngược lại trả về các thẻ vừa có kết quả
+        """
+
+        async with session_scope() as session:
+            card = await session.scalar(
+                select(HistoryExchangeCard).where(HistoryExchangeCard.request_id == str(payload["request_id"]))
+            )
+        if card is None:
+            logger.warning(f"[POLLER] Callback không tìm thấy thẻ: {payload['request_id']}")
+            return None
+
+        if card.status != "pending":
+            return []
+
+        try:
+            response = {
+                "status": int(payload["status"]),
+                "declared_value": int(payload.get("declared_value") or 0),
+                "message": payload.get("message"),
+            }
+        except (TypeError, ValueError):
+            logger.warning(f"[POLLER] Callback không hợp lệ: {payload}")
+            return []
+
+        # Thẻ vẫn đang xử lý, chờ callback tiếp theo
+        if response["status"] == 99:
+            return []
+
+        transition = self.apply_check_result(card, response)
+        if transition is None:
+            return []
+        return await self.commit_cards([card], [(card, *transition)])
+
+    async def _check_card(self, card_pending: HistoryExchangeCard) -> tuple:
+        """
+        Kiểm tra trạng thái một thẻ trên API (giới hạn số request đồng thời)
+        """
+
+        logger.info(f"[POLLER] Phát hiện thẻ đang chờ xử lý: {card_pending.transaction_id}")
+        data = {
+            "telco": card_pending.telco,
+            "amount": card_pending.value,
+            "code": card_pending.code,
+            "serial": card_pending.serial,
+            "request_id": card_pending.request_id,
+        }
+        async with self._check_semaphore:
+            response = await self.api.check_exchange_card(data)
+        return card_pending, response
+
+    def apply_check_result(self, card_pending: HistoryExchangeCard, response: dict) -> Optional[tuple]:
+        """
+        Cập nhật trạng thái thẻ (trong bộ nhớ) theo kết quả từ API
+
+        Trả về (status, error_message) nếu thẻ đã có kết quả cuối cùng, ngược lại trả về None
+        """
+
+        if response is None:
+            logger.error(f"[POLLER] Lỗi khi kiểm tra trạng thái thẻ: {card_pending.transaction_id}")
+            self.reschedule(card_pending)
+            return None
+
+        elif response["status"] == 99:
+            logger.info(f"[POLLER] Thẻ đã được xử lý: #{card_pending.transaction_id}")
+            self.reschedule(card_pending, 99)
+            return None
+
+        elif response["status"] == 4:
+            logger.info(f"[POLLER] Hệ thống đang bảo trì: #{card_pending.transaction_id}")
+            self.reschedule(card_pending, 4)
+            return None
+
+        elif response["status"] == 1:
+            logger.info(f"[POLLER] Thẻ thành công - đúng mệnh giá: #{card_pending.transaction_id}")
+            card_pending.card_value = response["declared_value"]
+            card_pending.status = "success"
+            return "success", None
+
+        elif response["status"] == 2:
+            logger.info(f"[POLLER] Thẻ thành công - sai mệnh giá - trừ 50% giá trị: #{card_pending.transaction_id}")
+            card_pending.card_value = response["declared_value"]
+            card_pending.status = "wrong_amount"
+            return "wrong_amount", None
+
+        else:
+            logger.error(f"[POLLER] Thẻ lỗi - {response['message']}: #{card_pending.transaction_id}")
+            card_pending.status = "failed"
+            return "failed", response.get("message")
+
+    async def commit_cards(self, cards: list, transitions: List[Transition] = (), leased: bool = False) -> List[Transition]:
+        """
+        Lưu trạng thái và lịch kiểm tra của các thẻ trong một transaction, chỉ ghi đè thẻ còn đang chờ
+
+        leased=True: lưu bằng một lệnh bulk update các thẻ còn thuộc lease của process này (thẻ đã bị
+        process khác nhận lại khi lease hết hạn được bỏ qua) và trả lại lease. Thẻ đã có kết quả qua
+        callback trong lúc kiểm tra chỉ được trả lại lease.
+        leased=False (callback): không đụng đến lease, thẻ có thể đang được process khác kiểm tra.
+        publish_updates=True: ghi thêm cập nhật Discord của các thẻ vừa có kết quả trong cùng transaction
+
+        Trả về các thẻ vừa có kết quả đã được lưu
+        """
+
+        if not cards:
+            return []
+
+        now = datetime.datetime.utcnow()
+        async with session_scope() as session:
+            if leased:
+                card_ids = [card.id for card in cards]
+                # Lấy khóa ghi trước khi đọc trạng thái: SQLite bỏ qua FOR UPDATE nhưng lệnh UPDATE giữ khóa ghi
+                # của database đến khi commit (PostgreSQL, MySQL: khóa các dòng), nên callback không thể kết thúc
+                # thẻ giữa lúc đọc và lúc lưu, chỉ thẻ thực sự được lưu mới tạo cập nhật Discord
+                await session.execute(
+                    update(HistoryExchangeCard)
+                    .where(HistoryExchangeCard.id.in_(card_ids), HistoryExchangeCard.lease_owner == self.owner)
+                    .values(lease_expires_at=now + datetime.timedelta(seconds=self.lease_duration))
+                    .execution_options(synchronize_session=False)
+                )
+                owned = dict((await session.execute(
+                    select(HistoryExchangeCard.id, HistoryExchangeCard.status)
+                    .where(HistoryExchangeCard.id.in_(card_ids), HistoryExchangeCard.lease_owner == self.owner)
+                )).all())
+                if len(owned) < len(cards):
+                    logger.warning(f"[POLLER] {len(cards) - len(owned)} thẻ đã hết hạn lease và được process khác nhận lại, bỏ qua kết quả")
+
+                finished = [card_id for card_id, status in owned.items() if status != "pending"]
+                if finished:
+                    await session.execute(
+                        update(HistoryExchangeCard)
+                        .where(HistoryExchangeCard.id.in_(finished), HistoryExchangeCard.lease_owner == self.owner)
+                        .values(lease_owner=None, lease_expires_at=None)
+                        .execution_options(synchronize_session=False)
+                    )
+
+                held = {card_id for card_id, status in owned.items() if status == "pending"}
+                cards = [card for card in cards if card.id in held]
+                transitions = [transition for transition in transitions if transition[0].id in held]
+                if cards:
+                    await session.execute(
+                        update(HistoryExchangeCard)
+                        .where(HistoryExchangeCard.lease_owner == self.owner, HistoryExchangeCard.status == "pending")
+                        .execution_options(synchronize_session=None),
+                        [
+                            {
+                                "id": card.id,
+                                "status": card.status,
+                                "card_value": card.card_value,
+                                "next_check_at": card.next_check_at,
+                                "check_attempts": card.check_attempts,
+                                "lease_owner": None,
+                                "lease_expires_at": None,
+                                "updated_at": now,
+                            }
+                            for card in cards
+                        ],
+                    )
+            else:
+                saved = set()
+                for card in cards:
+                    result = await session.execute(
+                        update(HistoryExchangeCard)
+                        .where(HistoryExchangeCard.id == card.id, HistoryExchangeCard.status == "pending")
+                        .values(
+                            status=card.status,
+                            card_value=card.card_value,
+                            next_check_at=card.next_check_at,
+                            check_attempts=card.check_attempts,
+                            updated_at=now,
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                    if result.rowcount:
+                        saved.add(card.id)
+                transitions = [transition for transition in transitions if transition[0].id in saved]
+
+            if self.publish_updates and transitions:
+                DiscordUpdateQueue.add(session, transitions)
+        return list(transitions)
+
+    def reschedule(self, card_pending: HistoryExchangeCard, provider_status: int = None) -> None:
+        """
+        Tăng số lần kiểm tra và đặt lịch kiểm tra tiếp theo (backoff theo số lần đã kiểm tra)
+
+        Số lần kiểm tra dừng tăng khi khoảng cách đã đạt max_delay
+        """
+
+        card_pending.check_attempts = min((card_pending.check_attempts or 0) + 1, self.schedule.max_attempts)
+        card_pending.next_check_at = self.schedule.next_check_at(card_pending.check_attempts, provider_status)
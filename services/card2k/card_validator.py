@@ -0,0 +1,141 @@
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from utils.config import ConfigSnapshot, get_settings
+
+# Mã lỗi trả về từ CardValidator.validate
+INVALID_TELCO = "invalid_telco"
+INVALID_AMOUNT = "invalid_amount"
+INVALID_CODE_SERIAL = "invalid_code_serial"
+
+
+@dataclass(frozen=True)
+class TelcoRule:
+    """
+    Luật kiểm tra thẻ của một nhà mạng
+    """
+
+    enabled: bool
+    amounts: FrozenSet[int]
+    serial_lengths: FrozenSet[int]
+    pin_lengths: FrozenSet[int]
+
+
+_DISABLED_RULE = TelcoRule(enabled=False, amounts=frozenset(), serial_lengths=frozenset(), pin_lengths=frozenset())
+
+
+@dataclass(frozen=True)
+class CardValidator:
+    """
+    Bảng kiểm tra thẻ đã biên dịch sẵn từ một snapshot cấu hình, chỉ đọc
+
+    - card_types: nhà mạng được bật
+    - card_amounts: mệnh giá được bật theo nhà mạng
+    - card_formats: độ dài serial/mã thẻ hợp lệ theo nhà mạng
+    """
+
+    rules: Mapping[str, TelcoRule]
+    version: int = 0
+
+    @classmethod
+    def from_settings(cls, settings: ConfigSnapshot) -> "CardValidator":
+        """
+        Biên dịch luật kiểm tra thẻ từ snapshot cấu hình
+        """
+
+        card_types = settings.get_value("card_types", {}) or {}
+        card_amounts = settings.get_value("card_amounts", {}) or {}
+        card_formats = {
+            str(telco).upper(): card_format
+            for telco, card_format in (settings.get_value("card_formats", {}) or {}).items()
+        }
+
+        rules = {}
+        for telco in set(card_types) | set(card_amounts):
+            card_format = card_formats.get(str(telco).upper()) or {}
+            rules[telco] = TelcoRule(
+                enabled=card_types.get(telco, False) is True,
+                amounts=frozenset(int(amount) for amount, enabled in (card_amounts.get(telco) or {}).items() if enabled),
+                serial_lengths=frozenset(int(length) for length in card_format.get("serial", ())),
+                pin_lengths=frozenset(int(length) for length in card_format.get("pin", ())),
+            )
+
+        return cls(rules=MappingProxyType(rules), version=settings.version)
+
+    def check_telco(self, telco: str) -> bool:
+        """
+        Kiểm tra nhà mạng có được bật không
+        """
+
+        return self.rules.get(telco, _DISABLED_RULE).enabled
+
+    def check_amount(self, telco: str, amount: int) -> bool:
+        """
+        Kiểm tra mệnh giá có được bật cho nhà mạng không
+        """
+
+        return amount in self.rules.get(telco, _DISABLED_RULE).amounts
+
+    def check_code_serial(self, telco: str, code: str, serial: str) -> bool:
+        """
+        Kiểm tra độ dài và ký tự của mã thẻ, serial
+        """
+
+        rule = self.rules.get(telco, _DISABLED_RULE)
+        return (
+            len(serial) in rule.serial_lengths
+            and len(code) in rule.pin_lengths
+            and serial.isalnum()
+            and code.isalnum()
+        )
+
+    def validate(self, telco: str, amount: int, code: str, serial: str) -> Optional[str]:
+        """
+        Kiểm tra toàn bộ thông tin thẻ
+
+        Trả về None nếu hợp lệ, ngược lại trả về mã lỗi (INVALID_TELCO, INVALID_AMOUNT, INVALID_CODE_SERIAL)
+        """
+
+        rule = self.rules.get(telco, _DISABLED_RULE)
+        if not rule.enabled:
+            return INVALID_TELCO
+        if amount not in rule.amounts:
+            return INVALID_AMOUNT
+        if not (
+            len(serial) in rule.serial_lengths
+            and len(code) in rule.pin_lengths
+            and serial.isalnum()
+            and code.isalnum()
+        ):
+            return INVALID_CODE_SERIAL
+        return None
+
+    def validate_many(self, cards: Iterable[Tuple[str, int, str, str]]) -> List[Optional[str]]:
+        """
+        Kiểm tra nhiều thẻ (telco, amount, code, serial), trả về mã lỗi theo thứ tự (None nếu hợp lệ)
+        """
+
+        validate = self.validate
+        return [validate(telco, amount, code, serial) for telco, amount, code, serial in cards]
+
+
+_validator: Optional[CardValidator] = None
+_validator_lock = threading.Lock()
+
+
+def get_card_validator() -> CardValidator:
+    """
+    Lấy CardValidator dùng chung, biên dịch lại khi snapshot cấu hình thay đổi
+    """
+
+    global _validator
+    settings = get_settings()
+    validator = _validator
+    if validator is None or validator.version != settings.version:
+        with _validator_lock:
+            if _validator is None or _validator.version != settings.version:
+                _validator = CardValidator.from_settings(settings)
+            validator = _validator
+    return validator
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+
+def _truncate_fee(fee: float) -> float:
+    """
+    Cắt phí còn 1 chữ số thập phân (không làm tròn)
+    """
+
+    return int(fee * 10) / 10
+
+
+# Kết quả khi không tìm thấy nhà mạng
+_EMPTY_TELCO_FEE_INFO = MappingProxyType({"fee_min": None, "amount_min": None, "list_fee": None})
+
+
+@dataclass(frozen=True)
+class FeeIndex:
+    """
+    Bảng phí đã được biên dịch sẵn từ một lần lấy phí, chỉ đọc
+
+    - telco_fee_info: {TELCO_UPPER: {"fee_min", "amount_min", "list_fee": {amount: fee} (tăng dần theo mệnh giá)}}
+    - min_fees_by_telco: {telco: fee_min} (tăng dần theo phí)
+    - cheapest_telco_rate: {"telco_min", "fee_min"}
+    """
+
+    telco_fee_info: Mapping[str, Mapping]
+    min_fees_by_telco: Optional[Mapping[str, float]]
+    cheapest_telco_rate: Optional[Mapping[str, object]]
+
+    @classmethod
+    def build(cls, data_api: list) -> "FeeIndex":
+        """
+        Biên dịch danh sách phí từ API thành bảng tra cứu
+        """
+
+        tables = {}
+        raw_min_by_telco = {}
+        cheapest_item = None
+        for item in data_api:
+            telco = item.get("telco")
+            fee = item.get("fees")
+            if fee is None:
+                continue
+            if cheapest_item is None or fee < cheapest_item["fees"]:
+                cheapest_item = item
+            if telco is None:
+                continue
+
+            if telco not in raw_min_by_telco or fee < raw_min_by_telco[telco]:
+                raw_min_by_telco[telco] = fee
+
+            amount = item.get("value")
+            if amount is not None:
+                tables.setdefault(str(telco).upper(), {})[int(amount)] = fee
+
+        telco_fee_info = {}
+        for telco_upper, fees in tables.items():
+            list_fee = {str(amount): fees[amount] for amount in sorted(fees)}
+            fee_min = min(fees.values())
+            amount_min = min(amount for amount, fee in fees.items() if fee == fee_min)
+            telco_fee_info[telco_upper] = MappingProxyType({
+                "fee_min": fee_min,
+                "amount_min": amount_min,
+                "list_fee": MappingProxyType(list_fee),
+            })
+
+        min_fees_by_telco = {
+            telco: _truncate_fee(fee)
+            for telco, fee in sorted(raw_min_by_telco.items(), key=lambda item: item[1])
+        }
+
+        cheapest_telco_rate = None
+        if cheapest_item is not None:
+            cheapest_telco_rate = MappingProxyType({
+                "telco_min": cheapest_item.get("telco"),
+                "fee_min": _truncate_fee(cheapest_item["fees"]),
+            })
+
+        return cls(
+            telco_fee_info=MappingProxyType(telco_fee_info),
+            min_fees_by_telco=MappingProxyType(min_fees_by_telco) if min_fees_by_telco else None,
+            cheapest_telco_rate=cheapest_telco_rate,
+        )
+
+    def get_telco_fee_info(self, telco: str) -> Mapping:
+        """
+        Tra cứu phí của một nhà mạng (không phân biệt hoa thường)
+        """
+
+        return self.telco_fee_info.get(str(telco).upper(), _EMPTY_TELCO_FEE_INFO)
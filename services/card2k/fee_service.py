@@ -1,11 +1,107 @@
+import asyncio
+import contextlib
+import time
+from typing import Optional
+
 from api.card2k.exchange_card import ExchangeCard as ExchangeCardAPI
+from services.card2k.fee_index import FeeIndex
 from helpers.console import logger
+from utils.config import get_config_value
 
 
 class FeeService:
-    def __init__(self):
-        self.api = ExchangeCardAPI()
-        self.data_api = self.api.get_fee_exchange_card()
+    def __init__(self, api: ExchangeCardAPI, ttl: Optional[float] = None):
+        self.api = api
+        self.ttl = float(ttl if ttl is not None else get_config_value("fee_cache.ttl", 300))
+        self.data_api = None
+        self.index: Optional[FeeIndex] = None
+
+        # Thông tin bản cache hiện tại
+        self.version = 0
+        self.fetched_at: Optional[float] = None
+
+        # Task refresh đang chạy (single-flight) và task refresh định kỳ
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._background_task: Optional[asyncio.Task] = None
+
+    @property
+    def age(self) -> Optional[float]:
+        """
+        Tuổi của bản cache hiện tại (giây), None nếu chưa có dữ liệu
+        """
+
+        if self.fetched_at is None:
+            return None
+        return time.monotonic() - self.fetched_at
+
+    def is_stale(self) -> bool:
+        """
+        Kiểm tra bản cache đã hết hạn chưa
+        """
+
+        age = self.age
+        return age is None or age >= self.ttl
+
+    async def start(self) -> None:
+        """
+        Tải phí lần đầu và khởi động task refresh định kỳ
+        """
+
+        await self.refresh()
+        if self._background_task is None or self._background_task.done():
+            self._background_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """
+        Dừng task refresh định kỳ và chờ các task đã hủy kết thúc (trước khi đóng HTTP client)
+        """
+
+        tasks = [task for task in (self._background_task, self._refresh_task) if task is not None and not task.done()]
+        self._background_task = None
+        self._refresh_task = None
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def refresh(self) -> asyncio.Task:
+        """
+        Làm mới phí từ API, các lời gọi đồng thời dùng chung một request
+        """
+
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch_fee())
+        return self._refresh_task
+
+    async def _fetch_fee(self) -> None:
+        data_api = await self.api.get_fee_exchange_card()
+        if not self._validated_data_api(data_api):
+            logger.warning(f"[Service Card2K Fee] Không thể làm mới phí, giữ bản cache v{self.version}")
+            return
+
+        # Biên dịch bảng tra cứu một lần cho mỗi bản cache
+        self.index = FeeIndex.build(data_api)
+        self.data_api = data_api
+        self.version += 1
+        self.fetched_at = time.monotonic()
+        logger.info(f"[Service Card2K Fee] Đã cập nhật phí đổi thẻ cào (v{self.version})")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"[Service Card2K Fee] Lỗi khi làm mới phí: {e}")
+
+    def _revalidate_if_stale(self) -> None:
+        """
+        Trả dữ liệu cũ ngay, đồng thời làm mới ở nền nếu đã hết hạn
+        """
+
+        if self.is_stale():
+            self.refresh()
 
     def get_cheapest_telco_rate(self) -> dict:
         """
@@ -15,20 +111,11 @@ class FeeService:
         Nếu không tìm thấy trả về None
         """
 
-        data_api = self.data_api
-        if not self._validated_data_api():
-            return None
-
-        valid_items = [item for item in data_api if item.get("fees") is not None]
-        if not valid_items:
+        self._revalidate_if_stale()
+        index = self.index
+        if index is None:
             return None
-        min_item = min(valid_items, key=lambda item: item["fees"])
-        raw_fee = min_item.get("fees")
-        truncated_fee = int(raw_fee * 10) / 10
-        return {
-            "telco_min": min_item.get("telco"),
-            "fee_min": truncated_fee,
-        }
+        return index.cheapest_telco_rate
 
     def get_min_fees_by_telco(self) -> dict:
         """
@@ -37,22 +124,11 @@ class FeeService:
         Trả về dict: {telco: fee_min, ...}
         Nếu không tìm thấy trả về None
         """
-        data_api = self.data_api
-        if not self._validated_data_api():
+        self._revalidate_if_stale()
+        index = self.index
+        if index is None:
             return None
-
-        telco_min_fees = {}
-        for item in data_api:
-            telco = item.get("telco")
-            fee = item.get("fees")
-            if telco is None or fee is None:
-                continue
-            if telco not in telco_min_fees or fee < telco_min_fees[telco]:
-                truncated_fee = int(fee * 10) / 10
-                telco_min_fees[telco] = truncated_fee
-        telco_min_fees = dict(sorted(telco_min_fees.items(), key=lambda item: item[1]))
-
-        return telco_min_fees if telco_min_fees else None
+        return index.min_fees_by_telco
 
     def get_telco_fee_info(self, telco: str) -> dict:
         """
@@ -60,56 +136,31 @@ class FeeService:
 
         Trả về dict:
         {
-            "telco": str,
             "fee_min": float,
-            "fees": List[float]
+            "amount_min": int,
+            "list_fee": {amount: fee} (tăng dần theo mệnh giá)
         }
         Nếu không tìm thấy trả về None
         """
 
-        data_api = self.data_api
-        if not self._validated_data_api():
+        self._revalidate_if_stale()
+        index = self.index
+        if index is None:
             return None
+        return index.get_telco_fee_info(telco)
 
-        result = {
-            "fee_min": None,
-            "amount_min": None,
-            "list_fee": None,
-        }
-        fee_dict = {}
-        for item in data_api:
-            if str(item.get("telco")).upper() == str(telco).upper():
-                amount = str(item.get("value"))
-                fee = item.get("fees")
-                if amount is not None and fee is not None:
-                    fee_dict[amount] = fee
-
-        if fee_dict:
-            # Tìm fee nhỏ nhất và amount tương ứng
-            min_fee = min(fee_dict.values())
-            min_amount = None
-            for amount, fee in fee_dict.items():
-                if fee == min_fee:
-                    min_amount = int(amount)
-                    break
-
-            result["fee_min"] = min_fee
-            result["amount_min"] = min_amount  
-            result["list_fee"] = fee_dict
-
-        return result
-
-    def _validated_data_api(self) -> bool:
+    def _validated_data_api(self, data_api) -> bool:
         """
         Kiểm tra dữ liệu API có hợp lệ không
         """
 
-        if not self.data_api:
+        if not data_api:
             return False
-        if len(self.data_api) == 0:
+        if not isinstance(data_api, list) or len(data_api) == 0:
+            logger.error(f"[Service Card2K Fee] Kết quả API: " + str(data_api))
             return False
-        if any("status" in item for item in self.data_api):
-            logger.error(f"[Service Card2K Fee] Kết quả API: " + str(self.data_api))
+        if any("status" in item for item in data_api):
+            logger.error(f"[Service Card2K Fee] Kết quả API: " + str(data_api))
             return False
 
         return True
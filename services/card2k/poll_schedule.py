@@ -0,0 +1,76 @@
+import datetime
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+from utils.config import get_config_value
+
+
+@dataclass(frozen=True)
+class PollSchedule:
+    """
+    Lịch kiểm tra trạng thái cho từng thẻ đang chờ xử lý
+
+    Thẻ mới được kiểm tra sau initial_delay giây, mỗi lần kiểm tra mà thẻ vẫn chờ
+    xử lý thì khoảng cách tăng theo backoff_factor, tối đa max_delay giây.
+    Khi nhà cung cấp bảo trì (status 4) thẻ được kiểm tra lại sau ít nhất maintenance_delay giây.
+    """
+
+    initial_delay: float = 5
+    backoff_factor: float = 2
+    max_delay: float = 300
+    maintenance_delay: float = 300
+
+    @classmethod
+    def from_config(cls) -> "PollSchedule":
+        """
+        Tạo lịch kiểm tra từ cấu hình card_status_check
+        """
+
+        config = get_config_value("card_status_check", {}) or {}
+        # delay_time là khoảng cách tối đa giữa hai lần kiểm tra một thẻ (tối thiểu 30 giây)
+        max_delay = max(30.0, float(config.get("delay_time", 60)))
+        return cls(
+            initial_delay=max(1.0, min(float(config.get("initial_delay", 5)), max_delay)),
+            backoff_factor=max(1.0, float(config.get("backoff_factor", 2))),
+            max_delay=max_delay,
+            maintenance_delay=float(config.get("maintenance_delay", max_delay)),
+        )
+
+    @property
+    def max_attempts(self) -> int:
+        """
+        Số lần kiểm tra mà từ đó khoảng cách đã đạt max_delay, kiểm tra thêm không làm khoảng cách tăng nữa
+        """
+
+        if self.backoff_factor <= 1 or self.initial_delay <= 0 or self.initial_delay >= self.max_delay:
+            return 0
+        return math.ceil(math.log(self.max_delay / self.initial_delay, self.backoff_factor))
+
+    def next_delay(self, attempts: int, provider_status: Optional[int] = None) -> float:
+        """
+        Số giây đến lần kiểm tra tiếp theo sau attempts lần kiểm tra
+        """
+
+        # Giới hạn số mũ để thẻ chờ rất lâu không làm phép lũy thừa bị tràn số (OverflowError)
+        attempts = min(max(0, attempts), self.max_attempts)
+        delay = min(self.initial_delay * (self.backoff_factor ** attempts), self.max_delay)
+        if provider_status == 4:
+            delay = max(delay, self.maintenance_delay)
+        return delay
+
+    def first_check_at(self, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+        """
+        Thời điểm kiểm tra đầu tiên của thẻ mới gửi (UTC)
+        """
+
+        now = now or datetime.datetime.utcnow()
+        return now + datetime.timedelta(seconds=self.initial_delay)
+
+    def next_check_at(self, attempts: int, provider_status: Optional[int] = None, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+        """
+        Thời điểm kiểm tra tiếp theo (UTC)
+        """
+
+        now = now or datetime.datetime.utcnow()
+        return now + datetime.timedelta(seconds=self.next_delay(attempts, provider_status))
@@ -0,0 +1,207 @@
+import datetime
+import random
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import update
+
+from database.leases import claim, new_lease_owner
+from database.models import CardSubmission, HistoryExchangeCard
+from database.session import session_scope
+from helpers.console import logger
+from services.card2k.poll_schedule import PollSchedule
+from utils.config import get_config_value
+from utils.string_utils import generate_uuid
+
+# Kết quả một lần gửi thẻ
+ACCEPTED = "accepted"
+REJECTED = "rejected"
+RETRY = "retry"
+
+# Trạng thái nhà cung cấp cho biết thẻ đã được tiếp nhận (chờ xử lý, thành công, sai mệnh giá, thất bại)
+_KNOWN_STATUSES = {1, 2, 3, 99}
+
+
+@dataclass(frozen=True)
+class DeliveryResult:
+    """
+    Kết quả gửi một yêu cầu: outcome (ACCEPTED, REJECTED, RETRY) và phản hồi từ nhà cung cấp
+    """
+
+    outcome: str
+    response: Optional[dict] = None
+
+    @property
+    def message(self) -> str:
+        if self.response is None:
+            return "Không kết nối được nhà cung cấp"
+        return f"{self.response.get('message')} (mã lỗi: {self.response.get('status')})"
+
+
+def _status_code(response: Optional[dict]) -> Optional[int]:
+    try:
+        return int(response["status"])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+class SubmissionOutbox:
+    """
+    Outbox gửi thẻ: yêu cầu được lưu theo request_id trước khi gọi nhà cung cấp
+
+    - enqueue: lưu yêu cầu, tạm giữ trong inflight_timeout giây để luồng gửi trực tiếp xử lý
+    - deliver: gửi thẻ; lỗi tạm thời (mạng, timeout, bảo trì, tạm ngắt) được gửi lại sau
+      retry_delay * 2^attempts giây (tối đa max_retry_delay, có jitter)
+    - Khi gửi lại, kiểm tra request_id trên nhà cung cấp trước để không gửi trùng thẻ đã được nhận
+    - Khi có nhiều bot, yêu cầu đến hạn được nhận bằng lease nên chỉ một bot gửi lại và báo kết quả
+    """
+
+    def __init__(self, api, schedule: Optional[PollSchedule] = None, owner: Optional[str] = None):
+        self.api = api
+        self.schedule = schedule or PollSchedule.from_config()
+        self.owner = owner or new_lease_owner()
+
+        config = get_config_value("submission_outbox", {}) or {}
+        self.inflight_timeout = float(config.get("inflight_timeout", 120))
+        self.retry_delay = float(config.get("retry_delay", 5))
+        self.max_retry_delay = float(config.get("max_retry_delay", 300))
+        self.max_attempts = max(1, int(config.get("max_attempts", 10)))
+        self.batch_size = max(1, int(config.get("batch_size", 50)))
+        self.lease_duration = max(1.0, float(config.get("lease_duration", 120)))
+
+    async def enqueue(self, telco: str, amount: int, code: str, serial: str, user_discord_id: str, channel_discord_id: Optional[str]) -> CardSubmission:
+        """
+        Lưu yêu cầu gửi thẻ trước khi gọi nhà cung cấp
+        """
+
+        submission = CardSubmission(
+            telco=telco,
+            value=amount,
+            code=code,
+            serial=serial,
+            user_discord_id=user_discord_id,
+            channel_discord_id=channel_discord_id,
+            request_id=generate_uuid(True),
+            status="pending",
+            next_attempt_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=self.inflight_timeout),
+        )
+        async with session_scope() as session:
+            session.add(submission)
+        return submission
+
+    async def get_due(self) -> List[CardSubmission]:
+        """
+        Nhận các yêu cầu chưa gửi xong đã đến hạn gửi lại (gồm cả yêu cầu còn dở khi bot dừng)
+
+        Yêu cầu đang được bot khác gửi lại bị bỏ qua
+        """
+
+        now = datetime.datetime.utcnow()
+        async with session_scope() as session:
+            return await claim(
+                session,
+                CardSubmission,
+                [CardSubmission.status == "pending", CardSubmission.next_attempt_at <= now],
+                order_by=CardSubmission.next_attempt_at,
+                limit=self.batch_size,
+                owner=self.owner,
+                duration=self.lease_duration,
+                now=now,
+            )
+
+    async def deliver(self, submission: CardSubmission, resume: bool = False) -> DeliveryResult:
+        """
+        Gửi thẻ đến nhà cung cấp
+
+        resume=True: yêu cầu có thể đã đến nhà cung cấp, kiểm tra request_id trước khi gửi lại
+        """
+
+        data = {
+            "telco": submission.telco,
+            "code": submission.code,
+            "serial": submission.serial,
+            "amount": submission.value,
+            "request_id": submission.request_id,
+        }
+
+        if resume:
+            response = await self.api.check_exchange_card(data)
+            if _status_code(response) in _KNOWN_STATUSES:
+                logger.info(f"[OUTBOX] Nhà cung cấp đã nhận thẻ trước đó: #{submission.request_id}")
+                return DeliveryResult(ACCEPTED, response)
+
+        response = await self.api.exchange_card(data)
+        status = _status_code(response)
+        if status in (99, 1, 2):
+            return DeliveryResult(ACCEPTED, response)
+        if response is None or status == 4:
+            return DeliveryResult(RETRY, response)
+        return DeliveryResult(REJECTED, response)
+
+    async def mark_accepted(self, submission: CardSubmission, response: dict, message_discord_id: str, server: str) -> HistoryExchangeCard:
+        """
+        Ghi thẻ vào lịch sử (chờ kiểm tra) và đánh dấu yêu cầu đã gửi xong trong cùng một transaction
+        """
+
+        history_exchange_card = HistoryExchangeCard(
+            telco=submission.telco,
+            value=submission.value,
+            code=submission.code,
+            serial=submission.serial,
+            user_discord_id=submission.user_discord_id,
+            message_discord_id=message_discord_id,
+            channel_discord_id=submission.channel_discord_id,
+            server=server,
+            request_id=submission.request_id,
+            transaction_id=response.get("trans_id"),
+            status="pending",
+            next_check_at=self.schedule.first_check_at(),
+        )
+        submission.status = "delivered"
+        submission.last_error = None
+        async with session_scope() as session:
+            session.add(history_exchange_card)
+            await self._save(session, submission)
+        return history_exchange_card
+
+    async def mark_rejected(self, submission: CardSubmission, result: DeliveryResult) -> None:
+        """
+        Nhà cung cấp từ chối thẻ, không gửi lại
+        """
+
+        submission.status = "rejected"
+        submission.last_error = result.message[:255]
+        async with session_scope() as session:
+            await self._save(session, submission)
+
+    async def mark_retry(self, submission: CardSubmission, result: DeliveryResult) -> bool:
+        """
+        Hẹn gửi lại với jitter, trả về False nếu đã hết số lần gửi lại (yêu cầu bị đánh dấu failed)
+        """
+
+        submission.attempts += 1
+        submission.last_error = result.message[:255]
+        if submission.attempts >= self.max_attempts:
+            submission.status = "failed"
+        else:
+            delay = min(self.retry_delay * (2 ** (submission.attempts - 1)), self.max_retry_delay)
+            submission.next_attempt_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=random.uniform(delay / 2, delay))
+        async with session_scope() as session:
+            await self._save(session, submission)
+        return submission.status == "pending"
+
+    @staticmethod
+    async def _save(session, submission: CardSubmission) -> None:
+        await session.execute(
+            update(CardSubmission)
+            .where(CardSubmission.id == submission.id)
+            .values(
+                status=submission.status,
+                attempts=submission.attempts,
+                next_attempt_at=submission.next_attempt_at,
+                last_error=submission.last_error,
+                lease_owner=None,
+                lease_expires_at=None,
+                updated_at=datetime.datetime.utcnow(),
+            )
+        )
@@ -0,0 +1,125 @@
+from typing import Optional
+
+import discord
+
+from database.models import HistoryExchangeCard
+from utils.embed import EmbedTemplate
+
+# Field dùng chung
+_SPACER = ("⠀", "⠀", True)
+
+CONFIRM_TEMPLATE = EmbedTemplate(
+    title="🔍 Xác nhận thông tin thẻ cào",
+    description="Vui lòng kiểm tra kỹ thông tin trước khi xác nhận:",
+    color=discord.Color.blue(),
+    fields=[
+        ("Nhà mạng", "{telco}", True),
+        ("Mệnh giá", "{amount:,} VND", True),
+        _SPACER,
+        ("Mã thẻ", "||{code}||", True),
+        ("Serial", "||{serial}||", True),
+        _SPACER,
+        ("⚠️ Lưu ý", "• Vui lòng kiểm tra kỹ thông tin trước khi xác nhận\n• Nhấn **Xác nhận** để tiếp tục hoặc **Hủy** để dừng lại", False),
+    ],
+)
+
+WAITING_TEMPLATE = EmbedTemplate(
+    title="⏳ Thẻ cào đang được xử lý",
+    description="Hệ thống đã tiếp nhận yêu cầu của bạn và đang xử lý...",
+    color=discord.Color.yellow(),
+    fields=[
+        ("Nhà mạng", "{telco}", True),
+        ("Mệnh giá", "{amount:,} VND", True),
+        ("Mã giao dịch", "`{order_id}`", True),
+        ("Serial", "||{serial}||", True),
+    ],
+)
+
+SUCCESS_TEMPLATE = EmbedTemplate(
+    title="✅ Thẻ cào đã được xử lý thành công",
+    description="Thẻ cào của bạn đã được xử lý thành công với đúng mệnh giá!",
+    color=discord.Color.green(),
+    fields=[
+        ("Nhà mạng", "{telco}", True),
+        ("Mệnh giá", "{amount:,} VND", True),
+        ("Mã giao dịch", "`{order_id}`", True),
+        ("Mã thẻ", "||{code}||", True),
+        ("Serial", "||{serial}||", True),
+        ("Mệnh giá thực tế", "**{card_value:,} VND**", True),
+        ("🎉 Chúc mừng", "Thẻ cào đã được xử lý thành công với đúng mệnh giá!", False),
+    ],
+)
+
+WRONG_AMOUNT_TEMPLATE = EmbedTemplate(
+    title="⚠️ Thẻ cào sai mệnh giá",
+    description="Thẻ cào đã được xử lý nhưng sai mệnh giá, giá trị sẽ bị trừ 50%.",
+    color=discord.Color.orange(),
+    fields=[
+        ("Nhà mạng", "{telco}", True),
+        ("Mệnh giá khai báo", "{amount:,} VND", True),
+        ("Mã giao dịch", "`{order_id}`", True),
+        ("Mã thẻ", "||{code}||", True),
+        ("Serial", "||{serial}||", True),
+        ("Mệnh giá thực tế", "{card_value:,} VND", True),
+        ("⚠️ Lưu ý", "Do thẻ sai mệnh giá, giá trị đã bị trừ 50% theo quy định.", False),
+    ],
+)
+
+FAILED_TEMPLATE = EmbedTemplate(
+    title="❌ Thẻ cào xử lý thất bại",
+    description="Rất tiếc, thẻ cào của bạn không thể được xử lý.",
+    color=discord.Color.red(),
+    fields=[
+        ("Nhà mạng", "{telco}", True),
+        ("Mệnh giá", "{amount:,} VND", True),
+        ("Mã giao dịch", "`{order_id}`", True),
+        ("Mã thẻ", "||{code}||", True),
+        ("Serial", "||{serial}||", True),
+        _SPACER,
+        ("❌ Lý do", "{reason}", False),
+    ],
+)
+
+_DEFAULT_FAILED_REASON = "Thẻ cào không hợp lệ hoặc đã được sử dụng."
+
+# Template theo trạng thái cuối cùng của thẻ
+RESULT_TEMPLATES = {
+    "success": SUCCESS_TEMPLATE,
+    "wrong_amount": WRONG_AMOUNT_TEMPLATE,
+    "failed": FAILED_TEMPLATE,
+}
+
+
+def confirm_embed(telco: str, amount: int, code: str, serial: str) -> discord.Embed:
+    """
+    Embed xác nhận thông tin thẻ trước khi gửi
+    """
+
+    return CONFIRM_TEMPLATE.render(telco=telco.capitalize(), amount=amount, code=code, serial=serial)
+
+
+def waiting_embed(telco: str, amount: int, serial: str, order_id: str) -> discord.Embed:
+    """
+    Embed thẻ đang chờ nhà cung cấp xử lý
+    """
+
+    return WAITING_TEMPLATE.render(telco=telco, amount=amount, serial=serial, order_id=order_id)
+
+
+def result_embed(card_history: HistoryExchangeCard, status: str, error_message: str = None) -> Optional[discord.Embed]:
+    """
+    Embed kết quả của thẻ theo trạng thái (success, wrong_amount, failed), None nếu trạng thái không hợp lệ
+    """
+
+    template = RESULT_TEMPLATES.get(status)
+    if template is None:
+        return None
+    return template.render(
+        telco=card_history.telco,
+        amount=card_history.value,
+        code=card_history.code,
+        serial=card_history.serial,
+        order_id=card_history.transaction_id,
+        card_value=card_history.card_value,
+        reason=error_message or _DEFAULT_FAILED_REASON,
+    )
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import discord
+
+from helpers.console import logger
+from helpers.metrics import discord_request_seconds
+
+# Giới hạn của Discord: tối đa 10 embed trong một message
+MAX_EMBEDS_PER_MESSAGE = 10
+
+
+@dataclass
+class _Notification:
+    embed: discord.Embed
+    user_discord_id: Optional[str] = None
+    role_id: Optional[str] = None
+
+
+@dataclass
+class _ChannelBuffer:
+    notifications: List[_Notification] = field(default_factory=list)
+    flush_task: Optional[asyncio.Task] = None
+    last_sent_at: float = float("-inf")
+
+
+class NotificationDispatcher:
+    """
+    Gom các thông báo gửi vào cùng một kênh để giảm số message (tránh rate limit theo kênh)
+
+    - Kênh đang yên (không gửi gì trong window giây): gửi ngay từng thông báo
+    - Kênh đang bận: gom thông báo trong window giây rồi gửi tối đa max_embeds embed mỗi message,
+      gộp ping vai trò và người gửi vào một dòng
+    """
+
+    def __init__(self, bot, window: float = 1.0, max_embeds: int = MAX_EMBEDS_PER_MESSAGE):
+        self.bot = bot
+        self.window = float(window)
+        self.max_embeds = max(1, min(int(max_embeds), MAX_EMBEDS_PER_MESSAGE))
+        self._buffers: Dict[int, _ChannelBuffer] = {}
+        self._flushing: Set[asyncio.Task] = set()
+
+        self.sent_messages = 0
+        self.sent_embeds = 0
+
+    async def notify(self, channel_id: int, embed: discord.Embed, user_discord_id: Optional[str] = None, role_id: Optional[str] = None) -> None:
+        """
+        Gửi thông báo vào kênh (gửi ngay nếu kênh đang yên, ngược lại gom lại gửi theo lô)
+        """
+
+        buffer = self._buffers.setdefault(channel_id, _ChannelBuffer())
+        notification = _Notification(embed, user_discord_id, role_id)
+
+        now = time.monotonic()
+        if not buffer.notifications and buffer.flush_task is None and now - buffer.last_sent_at >= self.window:
+            buffer.last_sent_at = now
+            await self._send(channel_id, [notification])
+            return
+
+        buffer.notifications.append(notification)
+        if len(buffer.notifications) >= self.max_embeds:
+            self._start_flush(channel_id)
+        elif buffer.flush_task is None:
+            buffer.flush_task = asyncio.create_task(self._flush_later(channel_id))
+
+    async def close(self) -> None:
+        """
+        Gửi hết các thông báo đang chờ
+        """
+
+        for channel_id, buffer in list(self._buffers.items()):
+            if buffer.flush_task is not None:
+                buffer.flush_task.cancel()
+                buffer.flush_task = None
+            if buffer.notifications:
+                self._start_flush(channel_id)
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "queued": sum(len(buffer.notifications) for buffer in self._buffers.values()),
+            "sent_messages": self.sent_messages,
+            "sent_embeds": self.sent_embeds,
+        }
+
+    async def _flush_later(self, channel_id: int) -> None:
+        await asyncio.sleep(self.window)
+        buffer = self._buffers[channel_id]
+        buffer.flush_task = None
+        await self._flush(channel_id)
+
+    def _start_flush(self, channel_id: int) -> None:
+        task = asyncio.create_task(self._flush(channel_id))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, channel_id: int) -> None:
+        buffer = self._buffers[channel_id]
+        while buffer.notifications:
+            batch = buffer.notifications[:self.max_embeds]
+            del buffer.notifications[:self.max_embeds]
+            buffer.last_sent_at = time.monotonic()
+            await self._send(channel_id, batch)
+
+    async def _send(self, channel_id: int, notifications: List[_Notification]) -> None:
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            logger.warning(f"[NOTIFY] Không tìm thấy kênh thông báo với ID: {channel_id}")
+            return
+
+        try:
+            with discord_request_seconds.time(operation="send"):
+                await channel.send(content=self._build_content(notifications), embeds=[item.embed for item in notifications])
+            self.sent_messages += 1
+            self.sent_embeds += len(notifications)
+        except discord.HTTPException as e:
+            logger.error(f"[NOTIFY] Lỗi khi gửi {len(notifications)} thông báo đến kênh {channel_id}: {str(e)}")
+
+    @staticmethod
+    def _build_content(notifications: List[_Notification]) -> str:
+        """
+        Gộp ping vai trò và người gửi (bỏ trùng, giữ thứ tự)
+        """
+
+        roles = list(dict.fromkeys(f"<@&{item.role_id}>" for item in notifications if item.role_id))
+        users = list(dict.fromkeys(f"<@{item.user_discord_id}>" for item in notifications if item.user_discord_id))
+        content = f"Người gửi: {', '.join(users)}" if users else ""
+        if roles:
+            content = f"{' '.join(roles)} - {content}" if content else " ".join(roles)
+        return content
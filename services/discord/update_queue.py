@@ -0,0 +1,91 @@
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.leases import claim, new_lease_owner
+from database.models import DiscordUpdate, HistoryExchangeCard
+from database.session import session_scope
+from helpers.console import logger
+
+
+class DiscordUpdateQueue:
+    """
+    Hàng đợi cập nhật Discord lưu trong database
+
+    Worker kiểm tra thẻ (worker.py) ghi kết quả thẻ và cập nhật cần gửi trong cùng một transaction,
+    bot lấy ra theo thứ tự, sửa message và gửi thông báo rồi xóa khỏi hàng đợi.
+    Khi có nhiều bot, mỗi lô được nhận bằng lease nên chỉ một bot gửi; lô của bot đã dừng
+    được bot khác nhận lại sau lease_duration giây.
+    """
+
+    def __init__(self, batch_size: int = 100, lease_duration: float = 120, owner: Optional[str] = None):
+        self.batch_size = max(1, int(batch_size))
+        self.lease_duration = max(1.0, float(lease_duration))
+        self.owner = owner or new_lease_owner()
+
+    @staticmethod
+    def add(session: AsyncSession, transitions: Sequence[Tuple[HistoryExchangeCard, str, Optional[str]]]) -> None:
+        """
+        Thêm cập nhật cho các thẻ vừa có kết quả vào session đang mở (commit cùng trạng thái thẻ)
+        """
+
+        session.add_all([
+            DiscordUpdate(
+                history_exchange_card_id=card.id,
+                status=status,
+                error_message=error_message[:255] if error_message else None,
+            )
+            for card, status, error_message in transitions
+        ])
+
+    async def get_batch(self) -> List[Tuple[DiscordUpdate, HistoryExchangeCard]]:
+        """
+        Nhận một lô cập nhật đang chờ (cũ nhất trước) kèm thẻ tương ứng
+        """
+
+        async with session_scope() as session:
+            updates = await claim(
+                session,
+                DiscordUpdate,
+                [],
+                order_by=DiscordUpdate.id,
+                limit=self.batch_size,
+                owner=self.owner,
+                duration=self.lease_duration,
+            )
+            if not updates:
+                return []
+            cards = await session.scalars(
+                select(HistoryExchangeCard).where(
+                    HistoryExchangeCard.id.in_({discord_update.history_exchange_card_id for discord_update in updates})
+                )
+            )
+            cards_by_id = {card.id: card for card in cards.all()}
+
+            # Thẻ đã bị xóa: bỏ luôn cập nhật, nếu không sẽ bị nhận lại sau mỗi lease_duration
+            orphan_ids = [
+                discord_update.id for discord_update in updates if discord_update.history_exchange_card_id not in cards_by_id
+            ]
+            if orphan_ids:
+                logger.warning(f"[DISCORD UPDATE] Bỏ {len(orphan_ids)} cập nhật không còn thẻ tương ứng: {orphan_ids}")
+                await session.execute(
+                    delete(DiscordUpdate).where(DiscordUpdate.id.in_(orphan_ids), DiscordUpdate.lease_owner == self.owner)
+                )
+        return [
+            (discord_update, cards_by_id[discord_update.history_exchange_card_id])
+            for discord_update in updates
+            if discord_update.history_exchange_card_id in cards_by_id
+        ]
+
+    async def remove(self, update_ids: Sequence[int]) -> None:
+        """
+        Xóa các cập nhật đã gửi xong (chỉ các cập nhật bot này còn giữ lease)
+        """
+
+        if not update_ids:
+            return
+        async with session_scope() as session:
+            await session.execute(
+                delete(DiscordUpdate).where(DiscordUpdate.id.in_(list(update_ids)), DiscordUpdate.lease_owner == self.owner)
+            )
@@ -1,104 +1,173 @@
 import os
+import time
+import datetime
 import discord
 
-
+from collections import OrderedDict
 from discord.ext import commands, tasks
 from database.models import HistoryExchangeCard
-from database.session import SessionLocal
 
-from api.card2k.exchange_card import ExchangeCard as ExchangeCardAPI
+from api.card2k.callback_server import CallbackServer
+from services.card2k.card_poller import CardPoller
+from services.discord.card_embeds import result_embed
+from services.discord.update_queue import DiscordUpdateQueue
+
 from utils.config import get_config_value
-from utils.env import get_env
-from utils.embed import _add_footer
+from utils.env import get_env, get_partner_key
 from helpers.console import logger
+from helpers.metrics import discord_request_seconds, poll_cycle_seconds
 
 class NapTheCaoTask(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.nap_the_cao_service = ExchangeCardAPI()
-        
-        if get_config_value("card_status_check", {}).get("type") == "api":
-            self.delay_time = int(get_config_value("card_status_check", {}).get("delay_time", 60))
+        self.nap_the_cao_service = bot.card2k_api
 
-            # Nếu delay_time nhỏ hơn 30 thì set lại thành 30
-            if self.delay_time < 30:
-                self.delay_time = 30
+        self.callback_server = None
+        # Các message đã bị xóa hoặc không có quyền truy cập, không thử cập nhật lại (giữ tối đa max_unreachable_messages)
+        self._unreachable_messages: "OrderedDict[int, None]" = OrderedDict()
+        self.max_unreachable_messages = 10000
+        # Engine kiểm tra thẻ, mỗi thẻ có lịch kiểm tra riêng (delay_time là khoảng cách tối đa, min: 30)
+        self.poller = CardPoller(bot.card2k_api)
+        self.schedule = self.poller.schedule
 
-            # Khởi tạo task loop với delay_time động
-            self.check_history_exchange_card.change_interval(seconds=self.delay_time)
+        if get_config_value("poll_worker.enabled", False):
+            # Worker riêng (worker.py) kiểm tra thẻ, bot chỉ gửi các cập nhật Discord từ hàng đợi
+            logger.info("[TASK: NAP_THE_CAO] Kiểm tra thẻ bằng worker riêng, bot chỉ cập nhật Discord.")
+            self.update_queue = DiscordUpdateQueue(
+                batch_size=get_config_value("poll_worker.batch_size", 100),
+                lease_duration=get_config_value("card_status_check.lease_duration", 120),
+            )
+            self.drain_discord_updates.change_interval(seconds=float(get_config_value("poll_worker.drain_interval", 2)))
+            self.drain_discord_updates.start()
+        elif get_config_value("card_status_check", {}).get("type") == "api":
+            self.delay_time = int(self.schedule.max_delay)
+
+            # Khởi tạo task loop, chu kỳ sau được đặt theo thẻ đến hạn sớm nhất
+            self.check_history_exchange_card.change_interval(seconds=self.schedule.initial_delay)
             self.check_history_exchange_card.start()
-            # Khởi tạo session để xử lý database
-            self.session = SessionLocal()
         else:
             logger.info("[TASK: NAP_THE_CAO] Kiểm tra lịch sử đổi thẻ cào bằng callback.")
+            self.callback_server = CallbackServer(
+                handler=self.handle_callback,
+                partner_key=get_partner_key(),
+                host=get_config_value("card_status_check.callback_host", "0.0.0.0"),
+                port=int(get_config_value("card_status_check.callback_port", 8080)),
+                path=get_config_value("card_status_check.callback_path", "/callback"),
+            )
 
-    def cog_unload(self):
+    async def cog_load(self):
+        if self.callback_server is not None:
+            await self.callback_server.start()
+
+    async def cog_unload(self):
         self.check_history_exchange_card.cancel()
-        self.session.close()
+        self.drain_discord_updates.cancel()
+        if self.callback_server is not None:
+            await self.callback_server.stop()
 
     @tasks.loop(seconds=60)
     async def check_history_exchange_card(self):
         await self._validated_setup()
 
-        history_exchange_cards = self.session.query(HistoryExchangeCard).filter(HistoryExchangeCard.status == "pending").all()
+        # Nhà cung cấp đang tạm ngắt: tạm dừng kiểm tra đến khi được thăm dò lại
+        if not await self.nap_the_cao_service.ensure_available():
+            breaker = self.nap_the_cao_service.circuit_breaker
+            retry_in = min(max(1.0, breaker.retry_in), self.schedule.max_delay)
+            logger.warning(f"[TASK: NAP_THE_CAO] Nhà cung cấp tạm ngắt ({breaker.reason}), tạm dừng kiểm tra {retry_in:.0f}s")
+            self._wake_at(datetime.datetime.utcnow() + datetime.timedelta(seconds=retry_in), force=True)
+            return
+
+        started_at = time.perf_counter()
+        # Cập nhật Discord cho các thẻ vừa có kết quả sau khi mỗi lô được lưu
+        result = await self.poller.poll_due(on_committed=self._update_discord_messages)
+        if result is None:
+            return
+
+        checked, _ = result
+        if checked == 0:
+            logger.debug("[TASK: NAP_THE_CAO] Không có thẻ đến hạn kiểm tra.")
+            await self._schedule_next_tick()
+            return
+
+        next_delay = await self._schedule_next_tick()
+
+        duration = time.perf_counter() - started_at
+        poll_cycle_seconds.observe(duration)
+        logger.info(
+            f"[TASK: NAP_THE_CAO] Hoàn tất chu kỳ kiểm tra {checked} thẻ trong {duration:.2f}s "
+            f"(concurrency: {self.poller.concurrency}, lần kiểm tra tiếp theo sau {next_delay:.0f}s)"
+        )
 
-        if len(history_exchange_cards) == 0:
-            logger.info("[TASK: NAP_THE_CAO] Không có thẻ đang chờ xử lý.")
+    @tasks.loop(seconds=2)
+    async def drain_discord_updates(self):
+        """
+        Gửi các cập nhật Discord do worker kiểm tra thẻ ghi vào hàng đợi
+        """
+
+        updates = await self.update_queue.get_batch()
+        if not updates:
             return
 
-        for card_pending in history_exchange_cards:
-            logger.info(f"[TASK: NAP_THE_CAO] Phát hiện thẻ đang chờ xử lý: {card_pending.transaction_id}")
-            data = {
-                "telco": card_pending.telco,
-                "amount": card_pending.value,
-                "code": card_pending.code,
-                "serial": card_pending.serial,
-                "request_id": card_pending.request_id,
-            }
-            response = self.nap_the_cao_service.check_exchange_card(data)
-
-            if response is None:
-                logger.error(f"[TASK: NAP_THE_CAO] Lỗi khi kiểm tra trạng thái thẻ: {card_pending.transaction_id}")
-                continue
-            
-            elif response["status"] == 99:
-                logger.info(f"[TASK: NAP_THE_CAO] Thẻ đã được xử lý: #{card_pending.transaction_id}")
-                continue
-            
-            elif response["status"] == 4:
-                logger.info(f"[TASK: NAP_THE_CAO] Hệ thống đang bảo trì: #{card_pending.transaction_id}")
-                continue
-            
-            elif response["status"] == 1:
-                logger.info(f"[TASK: NAP_THE_CAO] Thẻ thành công - đúng mệnh giá: #{card_pending.transaction_id}")
-                # Cập nhật trạng thái
-                card_pending.card_value = response["declared_value"]
-                card_pending.status = "success"
-                self.session.commit()
-                
-                # Cập nhật Discord message
-                await self._update_discord_message(card_pending, "success")
-                continue
-
-            elif response["status"] == 2:
-                logger.info(f"[TASK: NAP_THE_CAO] Thẻ thành công - sai mệnh giá - trừ 50% giá trị: #{card_pending.transaction_id}")
-                # Cập nhật trạng thái
-                card_pending.card_value = response["declared_value"]
-                card_pending.status = "wrong_amount"
-                self.session.commit()
-                
-                # Cập nhật Discord message
-                await self._update_discord_message(card_pending, "wrong_amount")
-                continue
-
-            else:
-                logger.error(f"[TASK: NAP_THE_CAO] Thẻ lỗi - {response['message']}: #{card_pending.transaction_id}")
-                card_pending.status = "failed"
-                self.session.commit()
-                
-                # Cập nhật Discord message
-                await self._update_discord_message(card_pending, "failed", response.get("message"))
-                continue
+        # Chỉ xóa cập nhật đã gửi xong (hoặc message không còn truy cập được), cập nhật lỗi tạm thời
+        # được nhận lại sau khi lease hết hạn
+        done = []
+        for discord_update, card_history in updates:
+            if await self._update_discord_message(card_history, discord_update.status, discord_update.error_message):
+                done.append(discord_update.id)
+        await self.update_queue.remove(done)
+        if len(done) < len(updates):
+            logger.warning(
+                f"[TASK: NAP_THE_CAO] {len(updates) - len(done)} cập nhật Discord lỗi, sẽ gửi lại sau {self.update_queue.lease_duration:.0f}s"
+            )
+
+        if len(updates) >= self.update_queue.batch_size:
+            logger.info(f"[TASK: NAP_THE_CAO] Đã gửi {len(updates)} cập nhật từ worker, hàng đợi vẫn còn cập nhật")
+
+    @drain_discord_updates.before_loop
+    async def before_drain(self):
+        await self.bot.wait_until_ready()
+        logger.info("[TASK: NAP_THE_CAO] Task gửi cập nhật từ worker đã được khởi động.")
+
+    def schedule_check(self, due_at: datetime.datetime) -> None:
+        """
+        Đánh thức poller sớm hơn nếu có thẻ đến hạn trước lần chạy tiếp theo (due_at: UTC)
+        """
+
+        self._wake_at(due_at)
+
+    async def _schedule_next_tick(self) -> float:
+        """
+        Đặt lần chạy tiếp theo vào thời điểm thẻ đang chờ đến hạn sớm nhất (tối đa delay_time)
+
+        Trả về số giây đến lần chạy tiếp theo
+        """
+
+        earliest, _ = await self.poller.next_due()
+        now = datetime.datetime.utcnow()
+        max_due_at = now + datetime.timedelta(seconds=self.schedule.max_delay)
+        due_at = min(earliest, max_due_at) if earliest is not None else max_due_at
+        self._wake_at(due_at, force=True)
+        return max(0.0, (due_at - now).total_seconds())
+
+    def _wake_at(self, due_at: datetime.datetime, force: bool = False) -> None:
+        """
+        Dời lần chạy tiếp theo của task loop đến due_at (UTC)
+
+        force=False: chỉ dời sớm hơn, force=True: đặt đúng thời điểm due_at
+        """
+
+        loop = self.check_history_exchange_card
+        next_iteration = loop.next_iteration
+        if not loop.is_running() or next_iteration is None:
+            return
+
+        due_at = due_at.replace(tzinfo=datetime.timezone.utc)
+        if not force and due_at >= next_iteration:
+            return
+
+        # change_interval tính lần chạy tiếp theo từ thời điểm bắt đầu lần chạy trước
+        last_iteration = next_iteration - datetime.timedelta(seconds=loop.seconds)
+        loop.change_interval(seconds=max(1.0, (due_at - last_iteration).total_seconds()))
 
     @check_history_exchange_card.before_loop
     async def before_check(self):
@@ -108,11 +177,25 @@ class NapTheCaoTask(commands.Cog):
         await self.bot.wait_until_ready()
         logger.info("[TASK: NAP_THE_CAO] Task NAP_THE_CAO đã được khởi động.")
 
+    async def handle_callback(self, payload: dict) -> bool:
+        """
+        Xử lý callback trạng thái thẻ từ nhà cung cấp
+
+        Trả về False nếu không tìm thấy thẻ theo request_id
+        """
+
+        transitions = await self.poller.handle_callback(payload)
+        if transitions is None:
+            return False
+
+        await self._update_discord_messages(transitions)
+        return True
+
     async def _validated_setup(self):
         """
         Kiểm tra các biến môi trường có tồn tại
         """
-        required_env = ["DISCORD_TOKEN", "GUILD_ID", "PARTNER_ID", "PARTNER_KEY"]
+        required_env = ["DISCORD_TOKEN", "PARTNER_ID", "PARTNER_KEY"]
         missing_env = [env for env in required_env if not get_env(env)]
 
         # Kiểm tra file .env có tồn tại
@@ -123,175 +206,79 @@ class NapTheCaoTask(commands.Cog):
         if missing_env:
             return logger.warning(f"[TASK: NAP_THE_CAO] Thiếu các biến môi trường: {', '.join(missing_env)}")
 
-    async def _update_discord_message(self, card_history: HistoryExchangeCard, status: str, error_message: str = None):
+    async def _update_discord_messages(self, transitions: list) -> None:
+        for card_history, status, error_message in transitions:
+            await self._update_discord_message(card_history, status, error_message)
+
+    async def _update_discord_message(self, card_history: HistoryExchangeCard, status: str, error_message: str = None) -> bool:
         """
         Cập nhật Discord message khi trạng thái thẻ thay đổi
+
+        Trả về True nếu đã gửi xong hoặc không thể gửi (message đã bị xóa, không có quyền, thiếu thông tin),
+        False nếu lỗi tạm thời và nên gửi lại
         """
         try:
-            # Tìm message Discord dựa trên message_discord_id và channel_discord_id
-            message_id = int(card_history.message_discord_id)
-            
-            message = None
-            
-            # Nếu có channel_discord_id, tìm trực tiếp trong channel đó
-            if card_history.channel_discord_id:
-                try:
-                    channel_id = int(card_history.channel_discord_id)
-                    channel = self.bot.get_channel(channel_id)
-                    if channel:
-                        message = await channel.fetch_message(message_id)
-                except (discord.NotFound, discord.Forbidden, discord.HTTPException, ValueError) as e:
-                    logger.warning(f"[TASK: NAP_THE_CAO] Không thể tìm message trong channel {card_history.channel_discord_id}: {str(e)}")
-            
-            # Nếu không tìm thấy message bằng channel_id, thử tìm trong tất cả channel
-            if not message:
-                for guild in self.bot.guilds:
-                    for channel in guild.text_channels:
-                        try:
-                            message = await channel.fetch_message(message_id)
-                            if message:
-                                break
-                        except (discord.NotFound, discord.Forbidden, discord.HTTPException):
-                            continue
-                    if message:
-                        break
-            
-            if not message:
-                logger.warning(f"[TASK: NAP_THE_CAO] Không tìm thấy Discord message với ID: {message_id}")
-                return
-            
+            message = self._get_partial_message(card_history)
+            if message is None:
+                return True
+
             # Tạo embed mới dựa trên trạng thái
-            new_embed = None
-            if status == "success":
-                new_embed = self._success_embed(card_history)
-            elif status == "wrong_amount":
-                new_embed = self._wrong_amount_embed(card_history)
-            elif status == "failed":
-                new_embed = self._failed_embed(card_history, error_message)
-            
+            new_embed = result_embed(card_history, status, error_message)
+
             if new_embed:
-                await message.edit(embed=new_embed)
+                # Sửa trực tiếp theo channel_id và message_id, không cần fetch trước
+                try:
+                    with discord_request_seconds.time(operation="edit"):
+                        await message.edit(embed=new_embed)
+                except (discord.NotFound, discord.Forbidden) as e:
+                    self._mark_unreachable(message.id)
+                    logger.warning(f"[TASK: NAP_THE_CAO] Không thể cập nhật message {message.id} trong channel {message.channel.id}: {str(e)}")
+                    return True
 
-                # Gửi thông báo nếu có kênh thông báo
+                # Gửi thông báo nếu có kênh thông báo (gom theo lô khi nhiều thẻ có kết quả cùng lúc)
                 notification_channel_id = get_config_value("notifications.nap_the_cao.channel_id")
                 if notification_channel_id:
                     try:
-                        notification_channel = self.bot.get_channel(int(notification_channel_id))
-                        role_id = get_config_value("notifications.nap_the_cao.role_id")
-                        if notification_channel:
-                            # Nếu có role_id thì ping role, nếu không thì chỉ gửi embed
-                            if role_id:
-                                await notification_channel.send(content=f"<@&{role_id}> - Người gửi: <@{card_history.user_discord_id}>", embed=new_embed)
-                            else:
-                                await notification_channel.send(content=f"Người gửi: <@{card_history.user_discord_id}>", embed=new_embed)
-                        else:
-                            logger.warning(f"[TASK: NAP_THE_CAO] Không tìm thấy kênh thông báo với ID: {notification_channel_id}")
-                    except (ValueError, discord.HTTPException) as e:
+                        await self.bot.notification_dispatcher.notify(
+                            int(notification_channel_id),
+                            new_embed,
+                            user_discord_id=card_history.user_discord_id,
+                            role_id=get_config_value("notifications.nap_the_cao.role_id") or None,
+                        )
+                    except ValueError as e:
                         logger.error(f"[TASK: NAP_THE_CAO] Lỗi khi gửi thông báo đến kênh {notification_channel_id}: {str(e)}")
                 logger.info(f"[TASK: NAP_THE_CAO] Đã cập nhật Discord message cho giao dịch: {card_history.transaction_id}")
-            
+            return True
+
         except Exception as e:
             logger.error(f"[TASK: NAP_THE_CAO] Lỗi khi cập nhật Discord message cho giao dịch {card_history.transaction_id}: {str(e)}")
+            return False
 
-    def _success_embed(self, card_history: HistoryExchangeCard) -> discord.Embed:
-        """
-        Tạo embed thông báo thành công
-        """
+    def _mark_unreachable(self, message_id: int) -> None:
+        self._unreachable_messages[message_id] = None
+        self._unreachable_messages.move_to_end(message_id)
+        while len(self._unreachable_messages) > self.max_unreachable_messages:
+            self._unreachable_messages.popitem(last=False)
 
-        telco = card_history.telco
-        amount = card_history.value
-        code = card_history.code
-        serial = card_history.serial
-        order_id = card_history.transaction_id
-        card_value = card_history.card_value
-
-        embed = discord.Embed(
-            title="✅ Thẻ cào đã được xử lý thành công",
-            description="Thẻ cào của bạn đã được xử lý thành công với đúng mệnh giá!",
-            color=discord.Color.green(),
-        )
-        embed.add_field(name="Nhà mạng", value=telco, inline=True)
-        embed.add_field(name="Mệnh giá", value=f"{amount:,} VND", inline=True)
-        embed.add_field(name="Mã giao dịch", value=f"`{order_id}`", inline=True)
-        embed.add_field(name="Mã thẻ", value=f"||{code}||", inline=True)
-        embed.add_field(name="Serial", value=f"||{serial}||", inline=True)
-        embed.add_field(name="Mệnh giá thực tế", value=f"**{card_value:,} VND**", inline=True)
-        embed.add_field(
-            name="🎉 Chúc mừng", 
-            value="Thẻ cào đã được xử lý thành công với đúng mệnh giá!", 
-            inline=False
-        )
-        embed = _add_footer(embed)
-        return embed
-    
-    def _wrong_amount_embed(self, card_history: HistoryExchangeCard) -> discord.Embed:
+    def _get_partial_message(self, card_history: HistoryExchangeCard):
         """
-        Tạo embed thông báo thành công sai mệnh giá (nhận 50% giá trị)
-        """
-
-        telco = card_history.telco
-        amount = card_history.value
-        code = card_history.code
-        serial = card_history.serial
-        order_id = card_history.transaction_id
-        card_value = card_history.card_value
-        
-        embed = discord.Embed(
-            title="⚠️ Thẻ cào sai mệnh giá",
-            description="Thẻ cào đã được xử lý nhưng sai mệnh giá, giá trị sẽ bị trừ 50%.",
-            color=discord.Color.orange(),
-        )
-        embed.add_field(name="Nhà mạng", value=telco, inline=True)
-        embed.add_field(name="Mệnh giá khai báo", value=f"{amount:,} VND", inline=True)
-        embed.add_field(name="Mã giao dịch", value=f"`{order_id}`", inline=True)
-        embed.add_field(name="Mã thẻ", value=f"||{code}||", inline=True)
-        embed.add_field(name="Serial", value=f"||{serial}||", inline=True)
-        embed.add_field(name="Mệnh giá thực tế", value=f"{card_value:,} VND", inline=True)
-        embed.add_field(
-            name="⚠️ Lưu ý", 
-            value="Do thẻ sai mệnh giá, giá trị đã bị trừ 50% theo quy định.", 
-            inline=False
-        )
-        embed = _add_footer(embed)
-        return embed
+        Lấy PartialMessage từ channel_discord_id và message_discord_id (không gọi API)
 
-    def _failed_embed(self, card_history: HistoryExchangeCard, error_message: str = None) -> discord.Embed:
-        """
-        Tạo embed thông báo thất bại
+        Trả về None nếu thiếu thông tin hoặc message đã được ghi nhận là không tồn tại
         """
 
-        telco = card_history.telco
-        amount = card_history.value
-        code = card_history.code
-        serial = card_history.serial
-        order_id = card_history.transaction_id
-        
-        embed = discord.Embed(
-            title="❌ Thẻ cào xử lý thất bại",
-            description="Rất tiếc, thẻ cào của bạn không thể được xử lý.",
-            color=discord.Color.red(),
-        )
-        embed.add_field(name="Nhà mạng", value=telco, inline=True)
-        embed.add_field(name="Mệnh giá", value=f"{amount:,} VND", inline=True)
-        embed.add_field(name="Mã giao dịch", value=f"`{order_id}`", inline=True)
-        embed.add_field(name="Mã thẻ", value=f"||{code}||", inline=True)
-        embed.add_field(name="Serial", value=f"||{serial}||", inline=True)
-        embed.add_field(name="⠀", value="⠀", inline=True)  # Spacer
-        if error_message:
-            embed.add_field(
-                name="❌ Lý do", 
-                value=f"{error_message}", 
-                inline=False
-            )
-        else:
-            embed.add_field(
-                name="❌ Lý do", 
-                value="Thẻ cào không hợp lệ hoặc đã được sử dụng.", 
-                inline=False
-            )
-        embed = _add_footer(embed)
-        return embed
+        try:
+            message_id = int(card_history.message_discord_id)
+            channel_id = int(card_history.channel_discord_id)
+        except (TypeError, ValueError):
+            logger.warning(f"[TASK: NAP_THE_CAO] Thiếu channel/message ID cho giao dịch: {card_history.transaction_id}")
+            return None
+
+        if message_id in self._unreachable_messages:
+            return None
 
+        channel = self.bot.get_partial_messageable(channel_id)
+        return channel.get_partial_message(message_id)
 
 
 # Hàm setup() này là bắt buộc để bot có thể load file này như một Cog
@@ -0,0 +1,100 @@
+import discord
+
+from discord.ext import commands, tasks
+
+from services.card2k.submission_outbox import ACCEPTED, REJECTED, SubmissionOutbox
+from services.discord.card_embeds import waiting_embed
+from utils.config import get_config_value
+from utils.embed import error_embed
+from helpers.console import logger
+from helpers.metrics import discord_request_seconds
+
+
+class SubmissionOutboxTask(commands.Cog):
+    """
+    Gửi lại các yêu cầu nạp thẻ chưa gửi xong (lỗi mạng, bảo trì hoặc bot dừng giữa chừng)
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.nap_the_cao_service = bot.card2k_api
+        self.outbox = SubmissionOutbox(bot.card2k_api)
+
+        self.deliver_pending_submissions.change_interval(seconds=float(get_config_value("submission_outbox.interval", 5)))
+        self.deliver_pending_submissions.start()
+
+    async def cog_unload(self):
+        self.deliver_pending_submissions.cancel()
+
+    @tasks.loop(seconds=5)
+    async def deliver_pending_submissions(self):
+        submissions = await self.outbox.get_due()
+        if not submissions:
+            return
+
+        # Nhà cung cấp đang tạm ngắt: để yêu cầu chờ đến chu kỳ sau
+        if not await self.nap_the_cao_service.ensure_available():
+            return
+
+        for submission in submissions:
+            try:
+                await self._deliver(submission)
+            except Exception as e:
+                logger.error(f"[TASK: OUTBOX] Lỗi khi gửi lại yêu cầu #{submission.request_id}: {e}")
+
+    @deliver_pending_submissions.before_loop
+    async def before_deliver(self):
+        """
+        Đảm bảo vòng lặp chỉ bắt đầu sau khi bot đã đăng nhập và sẵn sàng
+        """
+        await self.bot.wait_until_ready()
+        logger.info("[TASK: OUTBOX] Task gửi lại yêu cầu nạp thẻ đã được khởi động.")
+
+    async def _deliver(self, submission) -> None:
+        """
+        Gửi lại một yêu cầu và báo kết quả cho người dùng tại kênh đã gửi lệnh
+        """
+
+        result = await self.outbox.deliver(submission, resume=True)
+
+        if result.outcome == ACCEPTED:
+            message = await self._send(submission, waiting_embed(submission.telco, submission.value, submission.serial, result.response.get("trans_id")))
+            history_exchange_card = await self.outbox.mark_accepted(
+                submission,
+                result.response,
+                message_discord_id=str(message.id) if message is not None else "",
+                server=get_config_value("provider", "https://card2k.com"),
+            )
+            logger.info(f"[TASK: OUTBOX] Đã gửi lại thành công yêu cầu #{submission.request_id}")
+
+            nap_the_cao_task = self.bot.get_cog("NapTheCaoTask")
+            if nap_the_cao_task is not None:
+                nap_the_cao_task.schedule_check(history_exchange_card.next_check_at)
+            return
+
+        if result.outcome == REJECTED:
+            await self.outbox.mark_rejected(submission, result)
+            await self._send(submission, error_embed(result.message))
+            logger.error(f"[TASK: OUTBOX] Nhà cung cấp từ chối yêu cầu #{submission.request_id}: {result.response}")
+            return
+
+        if not await self.outbox.mark_retry(submission, result):
+            await self._send(submission, error_embed("Không gửi được thẻ sau nhiều lần thử, vui lòng liên hệ admin."))
+            logger.error(f"[TASK: OUTBOX] Hết số lần gửi lại yêu cầu #{submission.request_id}: {result.message}")
+
+    async def _send(self, submission, embed: discord.Embed):
+        """
+        Gửi thông báo kèm tag người dùng vào kênh đã gửi lệnh (không gọi API để lấy kênh)
+        """
+
+        try:
+            channel = self.bot.get_partial_messageable(int(submission.channel_discord_id))
+            with discord_request_seconds.time(operation="send"):
+                return await channel.send(content=f"<@{submission.user_discord_id}>", embed=embed)
+        except (TypeError, ValueError, discord.HTTPException) as e:
+            logger.warning(f"[TASK: OUTBOX] Không thể gửi thông báo cho yêu cầu #{submission.request_id}: {e}")
+            return None
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(SubmissionOutboxTask(bot))
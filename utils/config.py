@@ -1,8 +1,11 @@
 import os
+import asyncio
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, field
 from pathlib import Path
 from ruamel.yaml import YAML
-from typing import Dict, Any
-from functools import lru_cache
+from typing import Dict, Any, Iterator, Optional
 
 def load_yaml_config(file_path: str = "configs/settings.yml") -> Dict[str, Any]:
     """
@@ -48,23 +51,153 @@ def load_yaml_config(file_path: str = "configs/settings.yml") -> Dict[str, Any]:
     except Exception as e:
         raise RuntimeError(f"Failed to load YAML config from {file_path}: {e}")
 
-# Global cache function để có thể clear từ bên ngoài
-@lru_cache(maxsize=1)
-def _cached_yaml_loader(path: str) -> Dict[str, Any]:
-    return load_yaml_config(path)
+DEFAULT_CONFIG_PATH = "configs/settings.yml"
 
-def load_yaml_config_cached(file_path: str = "configs/settings.yml") -> Dict[str, Any]:
+
+def _freeze(value: Any) -> Any:
+    """
+    Chuyển dữ liệu YAML sang dạng chỉ đọc (dict -> ConfigNode, list -> tuple)
+    """
+    if isinstance(value, Mapping):
+        return ConfigNode(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ConfigNode(Mapping):
+    """
+    Nút cấu hình chỉ đọc, truy cập bằng thuộc tính (config.card_status_check.type) hoặc key (config["banner"])
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Mapping):
+        object.__setattr__(self, "_data", {key: _freeze(value) for key, value in data.items()})
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(f"Config key not found: {name}") from None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("ConfigNode is read-only")
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"ConfigNode({self._data!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Chuyển về dict thường (có thể chỉnh sửa)
+        """
+        return {
+            key: value.to_dict() if isinstance(value, ConfigNode) else value
+            for key, value in self._data.items()
+        }
+
+
+def _flatten(node: ConfigNode, prefix: str = "", result: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Tạo bảng tra cứu cho tất cả dotted key (vd: "notifications.nap_the_cao.channel_id")
+    """
+    if result is None:
+        result = {}
+    for key, value in node.items():
+        if not isinstance(key, str):
+            continue
+        dotted_key = f"{prefix}{key}"
+        result[dotted_key] = value
+        if isinstance(value, ConfigNode):
+            _flatten(value, f"{dotted_key}.", result)
+    return result
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Bản cấu hình chỉ đọc, được tạo một lần mỗi khi file cấu hình thay đổi
+
+    Truy cập: snapshot.card_status_check.delay_time hoặc snapshot.get_value("card_status_check.delay_time")
+    """
+
+    data: ConfigNode
+    file_path: str
+    mtime_ns: int
+    version: int
+    _lookup: Dict[str, Any] = field(repr=False, compare=False)
+
+    @classmethod
+    def load(cls, file_path: str = DEFAULT_CONFIG_PATH, version: int = 1) -> "ConfigSnapshot":
+        """
+        Đọc file cấu hình và biên dịch thành snapshot
+        """
+        mtime_ns = Path(file_path).stat().st_mtime_ns
+        data = ConfigNode(load_yaml_config(file_path))
+        return cls(data=data, file_path=file_path, mtime_ns=mtime_ns, version=version, _lookup=_flatten(data))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.data, name)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def get_value(self, key: str, default: Any = None) -> Any:
+        """
+        Lấy giá trị theo dotted key (một lần tra cứu dict)
+        """
+        return self._lookup.get(key, default)
+
+
+# Snapshot hiện tại của từng file cấu hình, được thay thế nguyên khối khi reload
+_snapshots: Dict[str, ConfigSnapshot] = {}
+_snapshot_lock = threading.Lock()
+
+
+def get_settings(file_path: str = DEFAULT_CONFIG_PATH) -> ConfigSnapshot:
+    """
+    Lấy snapshot cấu hình hiện tại (tải lần đầu nếu chưa có)
+    """
+    snapshot = _snapshots.get(file_path)
+    if snapshot is None:
+        snapshot = reload_config(file_path)
+    return snapshot
+
+
+def reload_config(file_path: str = DEFAULT_CONFIG_PATH) -> ConfigSnapshot:
     """
-    Load YAML config với caching (chỉ cache trong memory, không check file changes)
+    Đọc lại file cấu hình và thay snapshot hiện tại
+
+    Nếu file lỗi, snapshot cũ được giữ nguyên và ngoại lệ được raise
+    """
+    with _snapshot_lock:
+        current = _snapshots.get(file_path)
+        snapshot = ConfigSnapshot.load(file_path, version=current.version + 1 if current else 1)
+        _snapshots[file_path] = snapshot
+        return snapshot
+
+
+def load_yaml_config_cached(file_path: str = DEFAULT_CONFIG_PATH) -> ConfigNode:
+    """
+    Load YAML config từ snapshot hiện tại (chỉ đọc)
     
     Tham số:
         file_path: Đường dẫn tới file cấu hình YAML
 
-    Note: Cache sẽ persist cho đến khi restart application
+    Note: Snapshot được cập nhật khi file thay đổi (xem ConfigWatcher) hoặc sau set_config_value
     """
-    return _cached_yaml_loader(file_path)
+    return get_settings(file_path).data
 
-def get_config(file_path: str = "configs/settings.yml", use_cache: bool = True) -> Dict[str, Any]:
+def get_config(file_path: str = DEFAULT_CONFIG_PATH, use_cache: bool = True) -> Mapping[str, Any]:
     """
     Lấy dictionary chứa dữ liệu cấu hình
     
@@ -73,14 +206,14 @@ def get_config(file_path: str = "configs/settings.yml", use_cache: bool = True)
         use_cache: Tùy chọn lưu cache
         
     Trả về:
-        Dictionary chứa dữ liệu cấu hình
+        Dictionary chứa dữ liệu cấu hình (chỉ đọc nếu dùng cache)
     """
     if use_cache:
         return load_yaml_config_cached(file_path)
     else:
         return load_yaml_config(file_path)
 
-def get_config_value(key: str, default: Any = None, file_path: str = "configs/settings.yml") -> Any:
+def get_config_value(key: str, default: Any = None, file_path: str = DEFAULT_CONFIG_PATH) -> Any:
     """
     Lấy giá trị cụ thể từ cấu hình
     
@@ -93,23 +226,58 @@ def get_config_value(key: str, default: Any = None, file_path: str = "configs/se
         Config value or default
     """
     try:
-        config = get_config(file_path)
-        
-        # Support nested keys
-        keys = key.split(".")
-        value = config
-        
-        for k in keys:
-            if isinstance(value, dict) and k in value:
-                value = value[k]
-            else:
-                return default
-        
-        return value
-        
+        return get_settings(file_path).get_value(key, default)
     except Exception:
         return default
 
+
+class ConfigWatcher:
+    """
+    Theo dõi mtime của file cấu hình và nạp snapshot mới khi file thay đổi
+    """
+
+    def __init__(self, file_path: str = DEFAULT_CONFIG_PATH, interval: float = 2.0):
+        self.file_path = file_path
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        # mtime của bản file lỗi gần nhất, tránh log lặp lại cho cùng một bản
+        self._failed_mtime_ns: Optional[int] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    async def check(self) -> bool:
+        """
+        Nạp lại cấu hình nếu file đã thay đổi, trả về True nếu có snapshot mới
+        """
+        # Import trong hàm: helpers.console dùng utils.config khi khởi tạo logger
+        from helpers.console import logger
+
+        mtime_ns = None
+        try:
+            mtime_ns = os.stat(self.file_path).st_mtime_ns
+            if mtime_ns in (get_settings(self.file_path).mtime_ns, self._failed_mtime_ns):
+                return False
+            snapshot = await asyncio.to_thread(reload_config, self.file_path)
+            self._failed_mtime_ns = None
+            logger.info(f"[CONFIG] Đã tải lại cấu hình {self.file_path} (v{snapshot.version})")
+            return True
+        except Exception as e:
+            self._failed_mtime_ns = mtime_ns
+            logger.error(f"[CONFIG] Lỗi khi tải lại cấu hình {self.file_path}, giữ cấu hình cũ: {e}")
+            return False
+
 def set_config_value(key: str, value: Any, file_path: str = "configs/settings.yml") -> bool:
     """
     Thiết lập giá trị cụ thể trong cấu hình (tạo mới nếu không tồn tại)
@@ -162,8 +330,8 @@ def set_config_value(key: str, value: Any, file_path: str = "configs/settings.ym
         with open(config_file, "w", encoding="utf-8") as file:
             yaml.dump(config, file)
         
-        # Clear cache sau khi cập nhật file
-        _cached_yaml_loader.cache_clear()
+        # Tạo snapshot mới sau khi cập nhật file
+        reload_config(file_path)
         
         return True
         
@@ -1,5 +1,6 @@
 import discord
 from datetime import datetime, timezone
+from string import Formatter
 from typing import Optional, List, Dict, Any, Union
 from enum import Enum
 from constants import get_footer_text as get_footer_text_constant
@@ -91,3 +92,47 @@ def disabled_command_embed(description: str = "Từ chối quyền sử dụng")
     )
     embed = _add_footer(content)
     return embed
+
+
+class EmbedTemplate:
+    """
+    Embed dựng sẵn phần cố định (title, description, màu, footer, field tĩnh)
+
+    Mỗi field là (name, value, inline); value có thể chứa placeholder kiểu str.format
+    (vd: "{amount:,} VND"), khi render chỉ các field có placeholder được điền lại.
+    Field được thêm bằng Embed.add_field, không phụ thuộc thuộc tính nội bộ của discord.Embed.
+    """
+
+    def __init__(
+        self,
+        title: str,
+        description: str,
+        color: Union[discord.Color, int],
+        fields: List[tuple],
+        footer: Optional[str] = None,
+    ):
+        self.title = title
+        self.description = description
+        self.color = color if isinstance(color, discord.Colour) else discord.Colour(color)
+        self.footer_text = _get_footer_text(footer)
+        # (name, value, inline, hàm điền giá trị hoặc None nếu field tĩnh)
+        self._fields = tuple(
+            (
+                name,
+                value,
+                inline,
+                value.format_map if any(field_name is not None for _, field_name, _, _ in Formatter().parse(value)) else None,
+            )
+            for name, value, inline in fields
+        )
+
+    def render(self, **values: Any) -> discord.Embed:
+        """
+        Tạo embed mới từ template với các giá trị của field động
+        """
+
+        embed = discord.Embed(title=self.title, description=self.description, color=self.color)
+        for name, value, inline, fill in self._fields:
+            embed.add_field(name=name, value=fill(values) if fill is not None else value, inline=inline)
+        embed.set_footer(text=self.footer_text)
+        return embed
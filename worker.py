@@ -0,0 +1,181 @@
+import asyncio
+import datetime
+import os
+import signal
+import time
+
+from api.card2k.callback_server import CallbackServer
+from api.card2k.exchange_card import ExchangeCard as ExchangeCardAPI
+from database.base import Base
+from database.migrations import run_migrations
+from database.session import async_engine, engine
+from helpers.console import LogContext, logger
+from helpers.metrics import MetricsServer, metrics, poll_cycle_seconds
+from services.card2k.card_poller import CardPoller
+from utils.config import ConfigWatcher, get_config_value
+from utils.env import get_env, get_partner_key
+
+
+class PollWorker:
+    """
+    Process kiểm tra trạng thái thẻ chạy riêng với bot, không kết nối Discord
+
+    Worker đọc các thẻ đang chờ trong database dùng chung, gọi API card2k (hoặc nhận callback) và
+    ghi kết quả cùng các cập nhật Discord vào hàng đợi discord_updates để bot gửi.
+    Bật poll_worker.enabled trong settings.yml để bot không tự kiểm tra thẻ nữa.
+    """
+
+    def __init__(self):
+        self.card2k_api: ExchangeCardAPI = None
+        self.poller: CardPoller = None
+        self.callback_server: CallbackServer = None
+        self.config_watcher: ConfigWatcher = None
+        self.metrics_server: MetricsServer = None
+        # Số giây tối đa giữa hai lần đọc database (thẻ mới do bot gửi được phát hiện sau tối đa idle_interval)
+        self.idle_interval = max(1.0, float(get_config_value("poll_worker.idle_interval", 5)))
+        self._stopping: asyncio.Event = None
+
+    async def start(self):
+        with LogContext("Worker Setup"):
+            self._stopping = asyncio.Event()
+            self.card2k_api = ExchangeCardAPI()
+            self.poller = CardPoller(self.card2k_api, publish_updates=True)
+
+            if not get_config_value("poll_worker.enabled", False):
+                logger.warning("[WORKER] poll_worker.enabled đang tắt: bot cũng tự kiểm tra thẻ, các thẻ sẽ bị kiểm tra hai lần.")
+
+            if get_config_value("config_watcher.enabled", True):
+                self.config_watcher = ConfigWatcher(interval=float(get_config_value("config_watcher.interval", 2)))
+                self.config_watcher.start()
+
+            if get_config_value("metrics.enabled", False):
+                self.metrics_server = MetricsServer(
+                    metrics,
+                    host=get_config_value("metrics.host", "127.0.0.1"),
+                    port=int(get_config_value("poll_worker.metrics_port", 9101)),
+                    path=get_config_value("metrics.path", "/metrics"),
+                )
+                try:
+                    await self.metrics_server.start()
+                except OSError as e:
+                    logger.error(f"[METRICS] Không thể khởi động endpoint metrics: {e}")
+                    self.metrics_server = None
+
+            if get_config_value("card_status_check", {}).get("type") != "api":
+                self.callback_server = CallbackServer(
+                    handler=self._handle_callback,
+                    partner_key=get_partner_key(),
+                    host=get_config_value("card_status_check.callback_host", "0.0.0.0"),
+                    port=int(get_config_value("card_status_check.callback_port", 8080)),
+                    path=get_config_value("card_status_check.callback_path", "/callback"),
+                )
+                await self.callback_server.start()
+
+        logger.success("[WORKER] Worker kiểm tra thẻ đã sẵn sàng.")
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def close(self):
+        if self.callback_server is not None:
+            await self.callback_server.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        if self.config_watcher is not None:
+            await self.config_watcher.stop()
+        if self.card2k_api is not None:
+            await self.card2k_api.close()
+        await async_engine.dispose()
+
+    async def run(self):
+        """
+        Kiểm tra thẻ theo lịch cho đến khi nhận tín hiệu dừng (chế độ callback: chỉ chờ callback)
+        """
+
+        while not self._stopping.is_set():
+            delay = await self._tick() if self.callback_server is None else self.idle_interval
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _tick(self) -> float:
+        """
+        Một chu kỳ kiểm tra, trả về số giây đến chu kỳ tiếp theo
+        """
+
+        try:
+            # Nhà cung cấp đang tạm ngắt: tạm dừng kiểm tra đến khi được thăm dò lại
+            if not await self.card2k_api.ensure_available():
+                breaker = self.card2k_api.circuit_breaker
+                retry_in = min(max(1.0, breaker.retry_in), self.poller.schedule.max_delay)
+                logger.warning(f"[WORKER] Nhà cung cấp tạm ngắt ({breaker.reason}), tạm dừng kiểm tra {retry_in:.0f}s")
+                return retry_in
+
+            started_at = time.perf_counter()
+            result = await self.poller.poll_due()
+            if result is not None and result[0] > 0:
+                checked, transitions = result
+                duration = time.perf_counter() - started_at
+                poll_cycle_seconds.observe(duration)
+                logger.info(
+                    f"[WORKER] Hoàn tất chu kỳ kiểm tra {checked} thẻ trong {duration:.2f}s "
+                    f"({len(transitions)} thẻ có kết quả, concurrency: {self.poller.concurrency})"
+                )
+
+            earliest, _ = await self.poller.next_due()
+        except Exception as e:
+            logger.error(f"[WORKER] Lỗi trong chu kỳ kiểm tra: {e}")
+            return self.idle_interval
+
+        if earliest is None:
+            return self.idle_interval
+        delay = (earliest - datetime.datetime.utcnow()).total_seconds()
+        return max(1.0, min(delay, self.idle_interval))
+
+    async def _handle_callback(self, payload: dict) -> bool:
+        return await self.poller.handle_callback(payload) is not None
+
+
+async def main():
+    required_env = ["PARTNER_ID", "PARTNER_KEY"]
+    missing_env = [env for env in required_env if not get_env(env)]
+
+    # Kiểm tra file .env có tồn tại
+    if not os.path.exists(".env"):
+        raise ValueError("File .env không tồn tại")
+
+    # Kiểm tra các biến môi trường có tồn tại
+    if missing_env:
+        raise ValueError(f"Thiếu các biến môi trường: {', '.join(missing_env)}")
+
+    worker = PollWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except (NotImplementedError, AttributeError):
+            # Windows không hỗ trợ add_signal_handler, Ctrl+C vẫn dừng bằng KeyboardInterrupt
+            pass
+
+    try:
+        await worker.start()
+        await worker.run()
+    finally:
+        await worker.close()
+
+
+if __name__ == "__main__":
+    try:
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        asyncio.run(main())
+        print(f"[INFO] Worker đã dừng")
+    except KeyboardInterrupt:
+        print(f"[INFO] Worker đã dừng theo yêu cầu")
+    except Exception as e:
+        print(f"[ERROR] Lỗi khi chạy worker: {e}")
+    finally:
+        # Ghi hết log còn trong queue trước khi thoát
+        logger.shutdown()